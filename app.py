@@ -1,20 +1,43 @@
 # =========================================
-from datetime import datetime
+import base64
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+import contextvars
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+import csv
+import hashlib
 import io
+import json
+import logging
+import os
+import pickle
+import queue
+import select
+import tempfile
+import threading
+import time
+import uuid
 
 from flask import (
-    Flask, make_response, render_template, request, jsonify,
-    g, send_file, redirect, url_for, session
+    Flask, Response, make_response, render_template, request, jsonify,
+    g, has_request_context, send_file, redirect, url_for, session, stream_with_context
 )
+import click
 import psycopg2
+import psycopg2.extensions
 from psycopg2 import pool
+from psycopg2.extras import execute_values
 import openpyxl
+import requests
+from requests.adapters import HTTPAdapter
 from openpyxl import Workbook
 from openpyxl.styles import Font
 from werkzeug.security import check_password_hash, generate_password_hash
 
 app = Flask(__name__)
-app.secret_key = "ganti_dengan_secret_random"
+app.secret_key = os.getenv("SECRET_KEY", "ganti_dengan_secret_random")
 
 # =========================================
 # 1. Config Database & Flask
@@ -23,32 +46,514 @@ app.secret_key = "ganti_dengan_secret_random"
 DB_CONFIG = {
     # "host": "192.168.1.17",
     # "port": 15432,
-    "host": "postgres",
-    "port": 5432,
-    "dbname": "iin",
-    "user": "kipli_user",
-    "password": "kipli_password"
+    "host": os.getenv("DB_HOST", "postgres"),
+    "port": int(os.getenv("DB_PORT", 5432)),
+    "dbname": os.getenv("DB_NAME", "iin"),
+    "user": os.getenv("DB_USER", "kipli_user"),
+    "password": os.getenv("DB_PASSWORD", "kipli_password"),
 }
 
-# Gunakan connection pool agar efisien
-db_pool = psycopg2.pool.SimpleConnectionPool(
-    minconn=1,
-    maxconn=20,
-    **DB_CONFIG
-)
+# Read replica opsional untuk route baca berat (lihat get_read_db). Aktif kalau
+# DB_REPLICA_HOST atau DB_REPLICA_USER diisi; nilai lain mengikuti DB_CONFIG,
+# jadi satu instance dengan role read-only terpisah juga bisa dipakai.
+DB_REPLICA_CONFIG = None
+if os.getenv("DB_REPLICA_HOST") or os.getenv("DB_REPLICA_USER"):
+    DB_REPLICA_CONFIG = {
+        "host": os.getenv("DB_REPLICA_HOST", DB_CONFIG["host"]),
+        "port": int(os.getenv("DB_REPLICA_PORT", DB_CONFIG["port"])),
+        "dbname": os.getenv("DB_REPLICA_NAME", DB_CONFIG["dbname"]),
+        "user": os.getenv("DB_REPLICA_USER", DB_CONFIG["user"]),
+        "password": os.getenv("DB_REPLICA_PASSWORD", DB_CONFIG["password"]),
+        # tidak pernah menulis lewat koneksi ini, juga kalau diarahkan ke primary
+        "options": "-c default_transaction_read_only=on",
+    }
+
+# ----- Instrumentasi: histogram request & query, dibaca lewat /metrics -----
+
+class Histogram:
+    """Histogram kumulatif ala Prometheus per kombinasi label, aman antar-thread."""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name, help_text, labelnames, buckets=BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}    # labels -> [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, le in enumerate(self.buckets):
+                if value <= le:
+                    s[i] += 1
+            s[-2] += 1
+            s[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for labels, s in sorted(series.items()):
+            base = ",".join(f'{n}="{_metric_label(v)}"' for n, v in zip(self.labelnames, labels))
+            sep = "," if base else ""
+            for le, count in zip(self.buckets, s):
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{le}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {s[-2]}')
+            lines.append(f"{self.name}_count{{{base}}} {s[-2]}")
+            lines.append(f"{self.name}_sum{{{base}}} {s[-1]:.6f}")
+        return lines
+
+
+def _metric_label(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+http_latency = Histogram(
+    "kelontong_http_request_duration_seconds",
+    "Durasi request per route", ("route", "method", "status"))
+db_latency = Histogram(
+    "kelontong_db_query_duration_seconds",
+    "Durasi cursor.execute per query bernama", ("query",))
+
+# Nama query yang sedang jalan (label histogram db); diset lewat named_query()
+_query_name = contextvars.ContextVar("query_name", default=None)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 0))   # 0 = log query lambat mati
+slow_query_log = logging.getLogger("kelontong.slow_query")
+
+@contextmanager
+def named_query(name):
+    """
+    Beri nama untuk query di dalam blok (atau fungsi, sebagai decorator):
+        @named_query("query_penjualan")  /  with named_query("sync.detail"): ...
+    """
+    token = _query_name.set(name)
+    try:
+        yield
+    finally:
+        _query_name.reset(token)
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """Cursor yang mengukur setiap execute ke db_latency (+ log query lambat)."""
+
+    def _timed(self, method, query, args):
+        t0 = time.perf_counter()
+        try:
+            return method(query, args)
+        finally:
+            dt = time.perf_counter() - t0
+            name = _query_name.get()
+            if name is None:
+                name = f"route:{request.endpoint}" if has_request_context() else "-"
+            db_latency.observe(dt, name)
+            if has_request_context():
+                g.db_queries = g.get("db_queries", 0) + 1
+                g.db_seconds = g.get("db_seconds", 0.0) + dt
+            if SLOW_QUERY_MS and dt * 1000 >= SLOW_QUERY_MS:
+                sql = query.decode() if isinstance(query, bytes) else str(query)
+                slow_query_log.warning("%.1f ms %s: %s", dt * 1000, name, " ".join(sql.split())[:500])
+
+    def execute(self, query, vars=None):
+        return self._timed(super().execute, query, vars)
+
+    def executemany(self, query, vars_list):
+        return self._timed(super().executemany, query, vars_list)
+
+
+class PoolTimeout(pool.PoolError):
+    """Pool habis dan tidak ada koneksi yang kembali dalam batas waktu tunggu."""
+
+
+class DbPool:
+    """
+    Connection pool psycopg2 yang aman dipakai bersama antar-thread.
+
+    - getconn() menunggu (maks `timeout` detik) kalau semua koneksi terpakai,
+      lalu raise PoolTimeout.
+    - Koneksi yang idle lebih dari `check_after` detik di-ping dulu sebelum
+      dipinjamkan; koneksi rusak atau lebih tua dari `max_lifetime` diganti baru.
+    - stats() memberi counter waktu tunggu, koneksi terpakai dan kejadian pool habis.
+    """
+
+    def __init__(self, minconn, maxconn, timeout=10.0, max_lifetime=1800.0,
+                 check_after=30.0, **conn_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self._conn_kwargs = conn_kwargs
+
+        self._cond = threading.Condition()
+        self._idle = []        # [(conn, waktu_kembali)] — LIFO
+        self._born = {}        # id(conn) -> waktu dibuat
+        self._size = 0         # koneksi terbuka (idle + terpakai)
+        self._in_use = 0
+        self._stats = {
+            "checkouts": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "exhausted": 0,
+            "timeouts": 0,
+            "recycled": 0,
+        }
+
+        for _ in range(minconn):
+            conn = self._connect()
+            with self._cond:
+                self._size += 1
+                self._idle.append((conn, time.monotonic()))
+
+    def _connect(self):
+        conn = psycopg2.connect(**self._conn_kwargs)
+        self._born[id(conn)] = time.monotonic()
+        return conn
+
+    def _discard(self, conn):
+        self._born.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _expired(self, conn):
+        born = self._born.get(id(conn), 0)
+        return conn.closed or time.monotonic() - born > self.max_lifetime
+
+    def _healthy(self, conn, last_used):
+        if self._expired(conn):
+            return False
+        if time.monotonic() - last_used < self.check_after:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        counted = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    self._size += 1
+                    conn = None
+                    break
+                if not counted:
+                    self._stats["exhausted"] += 1
+                    counted = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(f"pool habis ({self.maxconn} koneksi), tunggu {self.timeout}s")
+                self._cond.wait(remaining)
+            self._in_use += 1
+
+        try:
+            if conn is not None and not self._healthy(conn, last_used):
+                self._discard(conn)
+                with self._cond:
+                    self._stats["recycled"] += 1
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._stats["checkouts"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+        return conn
+
+    def putconn(self, conn, close=False):
+        if not conn.closed and not close:
+            try:
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                close = True
+
+        with self._cond:
+            self._in_use -= 1
+            if close or self._expired(conn):
+                self._size -= 1
+                self._stats["recycled"] += 1
+                conn_to_close = conn
+            else:
+                self._idle.append((conn, time.monotonic()))
+                conn_to_close = None
+            self._cond.notify()
+        if conn_to_close is not None:
+            self._discard(conn_to_close)
+
+    @contextmanager
+    def connection(self):
+        """Pinjam koneksi di luar konteks request (thread lain, CLI)."""
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                **self._stats,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "maxconn": self.maxconn,
+            }
+
+
+_pools = {}          # nama -> (pid, DbPool)
+_pool_lock = threading.Lock()
+
+def _process_pool(nama, factory):
+    """Pool `nama` milik proses ini; dibuat ulang kalau pid berubah (setelah fork)."""
+    pid = os.getpid()
+    entry = _pools.get(nama)
+    if entry is None or entry[0] != pid:
+        with _pool_lock:
+            entry = _pools.get(nama)
+            if entry is None or entry[0] != pid:
+                entry = _pools[nama] = (pid, factory())
+    return entry[1]
+
+def get_pool():
+    """
+    Pool koneksi milik proses ini, dibuat saat pertama dipakai (bukan saat
+    import). Setelah fork (worker gunicorn) pid berubah → pool baru; koneksi
+    warisan proses induk tidak pernah dipakai bersama. Ukuran & perilaku
+    pool dari environment.
+    """
+    return _process_pool("primary", lambda: DbPool(
+        minconn=int(os.getenv("DB_POOL_MIN", 1)),
+        maxconn=int(os.getenv("DB_POOL_MAX", 20)),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT", 10)),
+        max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME", 1800)),
+        check_after=float(os.getenv("DB_POOL_CHECK_AFTER", 30)),
+        cursor_factory=TimedCursor,
+        **DB_CONFIG
+    ))
+
+def get_replica_pool():
+    """Pool read replica (None kalau DB_REPLICA_* tidak diisi). Koneksi dibuka saat perlu."""
+    if DB_REPLICA_CONFIG is None:
+        return None
+    return _process_pool("replica", lambda: DbPool(
+        minconn=0,
+        maxconn=int(os.getenv("DB_REPLICA_POOL_MAX", os.getenv("DB_POOL_MAX", 20))),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT", 10)),
+        max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME", 1800)),
+        check_after=float(os.getenv("DB_POOL_CHECK_AFTER", 30)),
+        cursor_factory=TimedCursor,
+        connect_timeout=int(os.getenv("DB_REPLICA_CONNECT_TIMEOUT", 3)),
+        **DB_REPLICA_CONFIG
+    ))
 
 def get_db():
     """Ambil koneksi database dari pool (per-request)."""
     if "db_conn" not in g:
-        g.db_conn = db_pool.getconn()
+        g.db_conn = get_pool().getconn()
     return g.db_conn
 
+# Route (nama endpoint) yang boleh membaca dari replica; sisanya selalu primary.
+READ_REPLICA_ROUTES = {r.strip() for r in os.getenv("DB_REPLICA_ROUTES", ",".join((
+    "penjualan", "print_transaksi_hari_ini", "print_detail_hari_ini",
+    "export_transaksi_hari_ini_xlsx", "export_detail_hari_ini_xlsx",
+    "export_transaksi_hari_ini_stream", "export_detail_hari_ini_stream",
+    "api_all_barang", "api_detail_barang",
+))).split(",") if r.strip()}
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", 1))       # detik, untuk data "hari ini"
+DB_REPLICA_LAG_CHECK = float(os.getenv("DB_REPLICA_LAG_CHECK", 1))   # umur maks hasil cek lag
+DB_REPLICA_RETRY = float(os.getenv("DB_REPLICA_RETRY", 30))          # jeda setelah replica gagal
+DB_REPLICA_MAX_LAG_PAST = float(os.getenv("DB_REPLICA_MAX_LAG_PAST", 30))   # detik, rentang hari lalu
+# Hasil query dari replica disimpan di report_cache paling lama sekian detik:
+# bisa saja dibaca sebelum replica menyusul invalidasi dari primary.
+DB_REPLICA_CACHE_TTL = float(os.getenv("DB_REPLICA_CACHE_TTL", 60))
+
+class ReplicaState:
+    """
+    Lag replica per proses, dicek paling sering sekali per DB_REPLICA_LAG_CHECK
+    detik. Replica yang gagal dihubungi dianggap mati selama DB_REPLICA_RETRY
+    detik supaya request berikutnya tidak ikut menunggu connect timeout.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self._lag = None          # detik; None = tidak bisa dipakai
+        self._down_until = 0.0
+        self.routed = {"replica": 0, "primary_route": 0, "primary_lag": 0, "primary_down": 0}
+
+    def count(self, key):
+        with self._lock:
+            self.routed[key] += 1
+
+    def mark_down(self):
+        with self._lock:
+            self._lag = None
+            self._down_until = time.monotonic() + DB_REPLICA_RETRY
+
+    def lag(self, pool):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._down_until:
+                return None
+            if now - self._checked < DB_REPLICA_LAG_CHECK:
+                return self._lag
+            self._checked = now    # thread lain memakai hasil lama selama cek berjalan
+        try:
+            with pool.connection() as conn, named_query("replica_lag"):
+                cur = conn.cursor()
+                # WAL yang sudah diterima sudah di-replay semua → lag 0, juga saat
+                # primary sepi (replay timestamp memang tidak maju)
+                cur.execute("""
+                    SELECT CASE
+                        WHEN NOT pg_is_in_recovery() THEN 0
+                        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                    END
+                """)
+                lag = float(cur.fetchone()[0])
+                cur.close()
+        except Exception as e:
+            logging.getLogger("kelontong.replica").warning("replica tidak bisa dipakai: %s", e)
+            self.mark_down()
+            return None
+        with self._lock:
+            self._lag = lag
+        return lag
+
+    def stats(self):
+        with self._lock:
+            return {
+                "lag_seconds": self._lag,
+                "down": time.monotonic() < self._down_until,
+                "routed": dict(self.routed),
+            }
+
+
+replica_state = ReplicaState()
+
+def get_read_pool(fresh=False):
+    """
+    Pool untuk query baca route ini: replica kalau dikonfigurasi, endpoint-nya
+    ada di READ_REPLICA_ROUTES dan replica hidup; selain itu primary.
+    Lag replica selalu dicek: fresh=True (rentang memuat hari ini) → maks
+    DB_REPLICA_MAX_LAG supaya transaksi yang baru di-sync tetap terlihat,
+    selain itu maks DB_REPLICA_MAX_LAG_PAST (sync offline mengubah hari lalu).
+    Request yang membaca replica ditandai (g.read_replica) supaya hasilnya
+    hanya sebentar di report_cache.
+    """
+    replica = get_replica_pool()
+    if replica is None:
+        return get_pool()
+    if not has_request_context() or request.endpoint not in READ_REPLICA_ROUTES:
+        replica_state.count("primary_route")
+        return get_pool()
+    lag = replica_state.lag(replica)
+    if lag is None:
+        replica_state.count("primary_down")
+        return get_pool()
+    if lag > (DB_REPLICA_MAX_LAG if fresh else DB_REPLICA_MAX_LAG_PAST):
+        replica_state.count("primary_lag")
+        return get_pool()
+    replica_state.count("replica")
+    g.read_replica = True
+    return replica
+
+def get_read_db(fresh=False):
+    """
+    Koneksi per-request untuk query baca (lihat get_read_pool). Kalau keputusannya
+    primary, ini koneksi yang sama dengan get_db().
+    """
+    if "read_db_conn" in g:
+        return g.read_db_conn
+    pool_ = get_read_pool(fresh)
+    if pool_ is get_pool():
+        return get_db()
+    try:
+        g.read_db_conn = pool_.getconn()
+    except psycopg2.OperationalError:
+        replica_state.mark_down()
+        return get_db()
+    return g.read_db_conn
+
+def includes_today(d2):
+    """Rentang ..d2 memuat hari ini (data bisa berubah detik ini) → butuh data segar."""
+    return d2 >= datetime.now().date()
+
 @app.teardown_appcontext
 def close_db(exception=None):
     """Kembalikan koneksi ke pool setelah request selesai."""
     db_conn = g.pop("db_conn", None)
     if db_conn is not None:
-        db_pool.putconn(db_conn)
+        get_pool().putconn(db_conn)
+    read_conn = g.pop("read_db_conn", None)
+    if read_conn is not None:
+        get_replica_pool().putconn(read_conn)
+
+@app.before_request
+def start_request_timer():
+    g.request_t0 = time.perf_counter()
+
+@app.after_request
+def add_server_timing(response):
+    """
+    Rincian durasi query (dari run_queries) + total DB di koneksi request →
+    header Server-Timing (lihat di DevTools); durasi request → http_latency.
+    """
+    durasi = dict(g.pop("server_timing", None) or {})
+    if g.get("db_queries"):
+        durasi["db"] = g.db_seconds
+    if durasi:
+        response.headers["Server-Timing"] = ", ".join(
+            f"{nama};dur={detik * 1000:.1f}" for nama, detik in durasi.items()
+        )
+
+    if request.path.startswith("/static/") and "v" in request.args and response.status_code == 200:
+        # URL ber-hash dari asset_url(): isinya tidak akan pernah berubah
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+
+    t0 = g.pop("request_t0", None)
+    if t0 is not None:
+        # respons streaming: hanya sampai generator dikembalikan, bukan sampai selesai
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        http_latency.observe(time.perf_counter() - t0, route, request.method, response.status_code)
+    return response
+
+@app.errorhandler(PoolTimeout)
+def handle_pool_timeout(e):
+    """Semua koneksi DB sedang terpakai terlalu lama → 503, klien boleh coba lagi."""
+    return jsonify({"status": "error", "msg": "server sibuk, coba lagi"}), 503
 
 # =========================================
 # 2. Helper Database & Util
@@ -66,6 +571,45 @@ def get_date_range_from_request(default_today=True):
     d2 = _parse_date(request.args.get("end", ""), today)
     return d1, d2
 
+def _date_bounds(d1, d2):
+    """
+    Rentang tanggal inklusif d1..d2 → batas timestamp setengah-terbuka [awal, akhir).
+    Dipakai sebagai `tanggal >= awal AND tanggal < akhir` supaya index btree
+    pada tanggal bisa dipakai (DATE(tanggal) BETWEEN ... tidak bisa).
+    """
+    return (datetime.combine(d1, dt_time.min),
+            datetime.combine(d2 + timedelta(days=1), dt_time.min))
+
+def _encode_cursor(values):
+    """Nilai kunci baris terakhir → string cursor opaque untuk keyset pagination."""
+    raw = json.dumps(values, default=_json_default).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _cursor_arg(parse):
+    """
+    Kebalikan _encode_cursor() untuk query string `cursor`: tidak ada → None,
+    selain itu `parse(nilai_json)` → nilai kunci. Cursor yang bukan base64
+    JSON atau bentuk/tipenya salah → ValueError (di-route jadi HTTP 400).
+    """
+    s = request.args.get("cursor")
+    if not s:
+        return None
+    try:
+        return parse(json.loads(base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))))
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError("cursor tidak valid")
+
+def _page_limit(default=100, maximum=500):
+    try:
+        return max(1, min(int(request.args.get("limit", default)), maximum))
+    except ValueError:
+        return default
+
+def _like_pattern(q):
+    """Teks cari → pola ILIKE '%q%' dengan % dan _ di-escape."""
+    q = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{q}%"
+
 HARI_ID = {
     "Monday": "Senin",
     "Tuesday": "Selasa",
@@ -89,35 +633,412 @@ def format_keterangan_tanggal(d1, d2):
         hari2 = HARI_ID[d2.strftime("%A")]
         return f"{hari1}, {d1.strftime('%d %B %Y')} s/d {hari2}, {d2.strftime('%d %B %Y')}"
 
+_asset_versions = {}   # path -> (mtime, hash)
+
+def asset_url(path):
+    """
+    URL /static/<path>?v=<hash isi file>. URL berubah tiap isi file berubah,
+    jadi browser & service worker boleh meng-cache-nya selamanya.
+    """
+    full = os.path.join(app.static_folder, path)
+    try:
+        mtime = os.path.getmtime(full)
+    except OSError:
+        return url_for("static", filename=path)
+    cached = _asset_versions.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(full, "rb") as f:
+            cached = _asset_versions[path] = (mtime, hashlib.sha256(f.read()).hexdigest()[:10])
+    return url_for("static", filename=path, v=cached[1])
+
+@app.context_processor
+def inject_asset_url():
+    return {"asset_url": asset_url}
+
+class TTLCache:
+    """Cache LRU kecil dengan TTL per entry, aman antar-thread."""
+
+    def __init__(self, maxsize=1024, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return default
+            expires_at, value = hit
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = None if ttl <= 0 else time.monotonic() + ttl
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# user + toko yang login, key: session["user_id"]
+user_cache = TTLCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", 1024)),
+    ttl=float(os.getenv("USER_CACHE_TTL", 60)),
+)
+
+class RedisCacheBackend:
+    """
+    Backend cache bersama antar proses/worker di atas redis (opsional,
+    `pip install redis`). Nilai disimpan sebagai pickle.
+    """
+
+    def __init__(self, url):
+        import redis
+        self.r = redis.Redis.from_url(url)
+
+    def get(self, key, default=None):
+        raw = self.r.get(key)
+        return default if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.r.set(key, pickle.dumps(value), ex=int(ttl) if ttl else None)
+
+    def incr(self, key):
+        return self.r.incr(key)
+
+    def counters(self, keys):
+        return [int(v or 0) for v in self.r.mget(keys)]
+
+
+class LocalCacheBackend(TTLCache):
+    """TTLCache + counter generasi, untuk ReportCache dalam satu proses."""
+
+    def __init__(self, maxsize=1024, ttl=0):
+        super().__init__(maxsize, ttl)
+        self._gen = {}
+
+    def incr(self, key):
+        with self._lock:
+            self._gen[key] = self._gen.get(key, 0) + 1
+            return self._gen[key]
+
+    def counters(self, keys):
+        with self._lock:
+            return [self._gen.get(k, 0) for k in keys]
+
+
+CacheEntry = namedtuple("CacheEntry", "name key ttl")
+_MISS = object()
+
+class ReportCache:
+    """
+    Cache hasil query laporan per toko.
+
+    Key memuat generasi toko: `past` naik kalau rollup hari yang sudah lewat
+    berubah (sync offline transaksi lama, rekap-refresh), `today` naik setiap
+    sync transaksi hari ini. Rentang yang mencakup hari ini memakai keduanya.
+    Invalidasi = naikkan generasi; entry lama tak terpakai lagi dan hilang
+    lewat LRU (lokal) / TTL (redis). Generasi hanya bersama antar proses
+    dengan backend redis; backend lokal hanya melihat invalidasi dari proses
+    sendiri, jadi semua entry-nya (termasuk hari lalu) wajib punya TTL.
+
+    Generasi dibaca *sebelum* query dijalankan, jadi hasil yang dihitung
+    bersamaan dengan sync tersimpan di key lama dan tidak pernah terbaca.
+    """
+
+    def __init__(self, backend, ttl_today=300, ttl_past=300, enabled=True):
+        self.backend = backend
+        self.ttl_today = ttl_today
+        self.ttl_past = ttl_past
+        self.enabled = enabled
+        self._stats = {}    # nama -> [hit, miss, error]
+        self._lock = threading.Lock()
+
+    def _count(self, name, idx):
+        with self._lock:
+            self._stats.setdefault(name, [0, 0, 0])[idx] += 1
+
+    def entry(self, name, toko_id, d1=None, d2=None, *args):
+        """Key cache untuk query `name`; d2=None → rentang terbuka (termasuk hari ini)."""
+        today = datetime.now().date()
+        with_today = d2 is None or d2 >= today
+        jenis = ("past", "today") if with_today else ("past",)
+        try:
+            gens = self.backend.counters([f"rpt:gen:{toko_id}:{j}" for j in jenis])
+        except Exception:
+            app.logger.exception("report cache: gagal baca generasi")
+            self._count(name, 2)
+            return None
+        parts = [name, toko_id, d1, d2, *args, *gens]
+        key = "rpt:" + ":".join("" if p is None else str(p) for p in parts)
+        return CacheEntry(name, key, self.ttl_today if with_today else self.ttl_past)
+
+    def get(self, entry):
+        if not self.enabled or entry is None:
+            return _MISS
+        try:
+            value = self.backend.get(entry.key, _MISS)
+        except Exception:
+            app.logger.exception("report cache: get gagal")
+            self._count(entry.name, 2)
+            return _MISS
+        self._count(entry.name, 0 if value is not _MISS else 1)
+        return value
+
+    def put(self, entry, value):
+        if not self.enabled or entry is None:
+            return
+        ttl = entry.ttl
+        if has_request_context() and g.get("read_replica"):
+            # mungkin dibaca sebelum replica menyusul invalidasi → jangan lama-lama
+            ttl = DB_REPLICA_CACHE_TTL if ttl <= 0 else min(ttl, DB_REPLICA_CACHE_TTL)
+        try:
+            self.backend.set(entry.key, value, ttl=ttl)
+        except Exception:
+            app.logger.exception("report cache: set gagal")
+            self._count(entry.name, 2)
+
+    def cached(self, name, toko_id, d1, d2, compute, *args):
+        """Ambil dari cache, atau compute() lalu simpan."""
+        entry = self.entry(name, toko_id, d1, d2, *args)
+        value = self.get(entry)
+        if value is _MISS:
+            value = compute()
+            self.put(entry, value)
+        return value
+
+    def invalidate(self, toko_id, days):
+        """Dipanggil setelah commit yang mengubah transaksi toko pada `days`."""
+        today = datetime.now().date()
+        jenis = {"today" if d >= today else "past" for d in days}
+        for j in jenis:
+            try:
+                self.backend.incr(f"rpt:gen:{toko_id}:{j}")
+            except Exception:
+                app.logger.exception("report cache: gagal naikkan generasi")
+
+    def stats(self):
+        with self._lock:
+            per_query = {n: {"hit": h, "miss": m, "error": e}
+                         for n, (h, m, e) in self._stats.items()}
+        return {
+            "backend": type(self.backend).__name__,
+            "enabled": self.enabled,
+            "hit": sum(v["hit"] for v in per_query.values()),
+            "miss": sum(v["miss"] for v in per_query.values()),
+            "queries": per_query,
+        }
+
+
+def report_cache_from_env():
+    """REPORT_CACHE_URL=redis://... → backend redis bersama; kosong → lokal per proses."""
+    url = os.getenv("REPORT_CACHE_URL")
+    if url:
+        backend = RedisCacheBackend(url)
+    else:
+        backend = LocalCacheBackend(maxsize=int(os.getenv("REPORT_CACHE_SIZE", 2048)))
+    # Tanpa redis, sync di worker lain / `flask rekap-refresh` tidak menaikkan
+    # generasi proses ini: TTL jadi batas basi, juga untuk hari lalu (sync
+    # offline transaksi lama). Dengan redis generasinya bersama → hari lalu
+    # boleh tanpa TTL (0).
+    ttl_today = float(os.getenv("REPORT_CACHE_TTL_TODAY", 300 if not url else 3600))
+    ttl_past = float(os.getenv("REPORT_CACHE_TTL_PAST", 300 if not url else 0))
+    if not url and ttl_past <= 0:
+        app.logger.warning("REPORT_CACHE_TTL_PAST=0 tanpa REPORT_CACHE_URL: "
+                           "pakai 300 detik (cache lokal tidak bisa diinvalidasi antar worker)")
+        ttl_past = 300.0
+    return ReportCache(
+        backend,
+        ttl_today=ttl_today,
+        ttl_past=ttl_past,
+        enabled=os.getenv("REPORT_CACHE", "true").lower() in ("1", "true", "yes"),
+    )
+
+report_cache = report_cache_from_env()
+
+
+PENJUALAN_CHANNEL = "penjualan_baru"   # NOTIFY dari notify_penjualan()
+
+class PenjualanFeed:
+    """
+    Fan-out NOTIFY penjualan_baru ke stream SSE /api/penjualan/stream.
+
+    Satu thread LISTEN per proses dengan koneksi sendiri (di luar pool),
+    dijalankan saat stream pertama datang dan berhenti kalau sudah tidak ada
+    stream. Tiap stream punya queue sendiri per toko. Queue penuh (klien
+    lambat) atau koneksi LISTEN putus → stream dikirimi {"resync": True}
+    karena notifikasi di antaranya hilang.
+
+    Tiap stream memakai satu thread gunicorn selama terbuka, jadi jumlahnya
+    dibatasi `max_subscribers` per proses.
+    """
+
+    def __init__(self, db_config, max_subscribers=4, queue_size=100, poll_interval=5.0):
+        self.db_config = db_config
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._subs = {}          # toko_id -> set(queue.Queue)
+        self._thread = None
+        self._pid = None
+        self._stats = {"notifications": 0, "resync": 0, "rejected": 0, "reconnects": 0}
+
+    def subscribe(self, toko_id):
+        """Queue event untuk toko ini; None kalau stream per proses sudah penuh."""
+        with self._lock:
+            if sum(len(qs) for qs in self._subs.values()) >= self.max_subscribers:
+                self._stats["rejected"] += 1
+                return None
+            q = queue.Queue(self.queue_size)
+            self._subs.setdefault(toko_id, set()).add(q)
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="penjualan-feed", daemon=True)
+                self._thread.start()
+            return q
+
+    def unsubscribe(self, toko_id, q):
+        with self._lock:
+            qs = self._subs.get(toko_id)
+            if qs is not None:
+                qs.discard(q)
+                if not qs:
+                    del self._subs[toko_id]
+
+    def _send(self, q, event):
+        try:
+            q.put_nowait(event)
+        except queue.Full:
+            while True:
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    break
+            q.put_nowait({"resync": True})
+            self._stats["resync"] += 1
+
+    def _dispatch(self, payload):
+        try:
+            event = json.loads(payload)
+            toko_id = int(event["toko_id"])
+        except (ValueError, KeyError, TypeError):
+            app.logger.warning("penjualan feed: payload tidak valid: %.200s", payload)
+            return
+        with self._lock:
+            self._stats["notifications"] += 1
+            for q in self._subs.get(toko_id, ()):
+                self._send(q, event)
+
+    def _resync_all(self):
+        with self._lock:
+            for qs in self._subs.values():
+                for q in qs:
+                    self._send(q, {"resync": True})
+
+    def _run(self):
+        conn = None
+        putus = False
+        while True:
+            with self._lock:
+                if not self._subs:
+                    self._thread = None
+                    break
+            try:
+                if conn is None:
+                    conn = psycopg2.connect(**self.db_config)
+                    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                    conn.cursor().execute(f"LISTEN {PENJUALAN_CHANNEL}")
+                    if putus:
+                        self._stats["reconnects"] += 1
+                        self._resync_all()
+                        putus = False
+                if select.select([conn], [], [], self.poll_interval)[0]:
+                    conn.poll()
+                    while conn.notifies:
+                        self._dispatch(conn.notifies.pop(0).payload)
+            except (psycopg2.Error, OSError, ValueError):
+                app.logger.exception("penjualan feed: koneksi LISTEN gagal, sambung ulang")
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except psycopg2.Error:
+                        pass
+                conn, putus = None, True
+                time.sleep(self.poll_interval)
+        if conn is not None:
+            conn.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "subscribers": sum(len(qs) for qs in self._subs.values()),
+                "max_subscribers": self.max_subscribers,
+                "listening": self._thread is not None,
+            }
+
+penjualan_feed = PenjualanFeed(
+    DB_CONFIG,
+    max_subscribers=int(os.getenv("PENJUALAN_STREAM_MAX", 4)),
+)
+
 def get_current_user():
-    """Ambil user yang sedang login dari session."""
+    """
+    Ambil user yang sedang login dari session.
+    Hasil di-memo per request (g.current_user) dan di-cache antar request
+    (user_cache, dihapus saat login/logout/register).
+    """
     if "user_id" not in session:
         return None
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT u.id, u.nama, u.username, u.role,
-               t.id, t.nama, t.kode, t.alamat
-        FROM users u
-        JOIN toko t ON u.toko_id = t.id
-        WHERE u.id = %s
-    """, (session["user_id"],))
-    row = cur.fetchone()
-    cur.close()
-    if row:
-        return {
-            "id": row[0],
-            "nama": row[1],
-            "username": row[2],
-            "role": row[3],
-            "toko": {
-                "id": row[4],
-                "nama": row[5],
-                "kode": row[6],
-                "alamat": row[7],
+    if "current_user" in g:
+        return g.current_user
+
+    user_id = session["user_id"]
+    user = user_cache.get(user_id)
+    if user is None:
+        conn = get_db()
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT u.id, u.nama, u.username, u.role,
+                   t.id, t.nama, t.kode, t.alamat
+            FROM users u
+            JOIN toko t ON u.toko_id = t.id
+            WHERE u.id = %s
+        """, (user_id,))
+        row = cur.fetchone()
+        cur.close()
+        if row:
+            user = {
+                "id": row[0],
+                "nama": row[1],
+                "username": row[2],
+                "role": row[3],
+                "toko": {
+                    "id": row[4],
+                    "nama": row[5],
+                    "kode": row[6],
+                    "alamat": row[7],
+                }
             }
-        }
-    return None
+            user_cache.set(user_id, user)
+
+    g.current_user = user
+    return user
 
 def login_required(fn):
     """Decorator sederhana untuk proteksi route."""
@@ -133,55 +1054,440 @@ def login_required(fn):
 # 3. Helper Query Internal
 # =========================================
 
-def query_penjualan(conn, toko_id, d1, d2):
-    cur = conn.cursor()
-    cur.execute("""
+PENJUALAN_PAGE_SIZE = 100
+
+@named_query("query_penjualan")
+def query_penjualan(conn, toko_id, d1, d2, limit=None, after=None, ids=None):
+    """
+    Daftar transaksi terbaru dulu, urut (tanggal, id) DESC.
+    limit/after untuk keyset pagination: after = (tanggal, id) baris terakhir
+    halaman sebelumnya. Tanpa limit → semua baris dalam rentang.
+    ids: hanya transaksi ini (stream transaksi baru).
+    """
+    sql = """
         SELECT id, tanggal, tx8, nama, no_hp, metode_bayar, total, laba, jml_item
         FROM v_penjualan_hari_ini
-        WHERE DATE(tanggal) BETWEEN %s AND %s AND toko_id = %s
-        ORDER BY tanggal DESC
-    """, (d1, d2, toko_id))
+        WHERE tanggal >= %s AND tanggal < %s AND toko_id = %s
+    """
+    params = [*_date_bounds(d1, d2), toko_id]
+    if after:
+        sql += " AND (tanggal, id) < (%s, %s)"
+        params += list(after)
+    if ids:
+        sql += " AND id = ANY(%s)"
+        params.append(list(ids))
+    sql += " ORDER BY tanggal DESC, id DESC"
+    if limit:
+        sql += " LIMIT %s"
+        params.append(limit)
+    cur = conn.cursor()
+    cur.execute(sql, params)
     return cur.fetchall()
 
+def _tanggal_id_cursor(v):
+    """Cursor (tanggal, id) daftar penjualan/nota: [ISO datetime, int]."""
+    if not (isinstance(v, list) and len(v) == 2 and isinstance(v[0], str)
+            and isinstance(v[1], int) and not isinstance(v[1], bool)):
+        raise ValueError("cursor tidak valid")
+    return [datetime.fromisoformat(v[0]), v[1]]
+
+def _penjualan_page(rows, limit):
+    """Potong hasil query limit+1 → (rows, next_cursor)."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, _encode_cursor([rows[-1][1], rows[-1][0]])
+
+@named_query("query_detail")
 def query_detail(conn, toko_id, d1, d2):
     cur = conn.cursor()
     cur.execute("""
         SELECT barcode, item_nama, harga_beli, harga_jual, total_qty, total_penjualan, total_laba
-        FROM v_penjualan_rekap_barang_hari_ini
+        FROM rekap_harian_barang
         WHERE toko_id = %s AND tgl BETWEEN %s AND %s
         ORDER BY item_nama, harga_jual
     """, (toko_id, d1, d2))
     return cur.fetchall()
 
+@named_query("query_ringkasan")
 def query_ringkasan(conn, toko_id, d1, d2):
     cur = conn.cursor()
     cur.execute("""
         SELECT tgl, jml_transaksi, jml_item, total_omzet, total_laba
-        FROM v_laporan_ringkasan
+        FROM rekap_harian
         WHERE toko_id = %s AND tgl BETWEEN %s AND %s
         ORDER BY tgl
     """, (toko_id, d1, d2))
     return cur.fetchall()
 
+@named_query("query_ringkasan_total")
+def query_ringkasan_total(conn, toko_id, d1, d2):
+    """Total transaksi, item, omzet, laba untuk rentang tanggal (1 baris)."""
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT COALESCE(SUM(jml_transaksi), 0),
+               COALESCE(SUM(jml_item), 0),
+               COALESCE(SUM(total_omzet), 0),
+               COALESCE(SUM(total_laba), 0)
+        FROM rekap_harian
+        WHERE toko_id = %s AND tgl BETWEEN %s AND %s
+    """, (toko_id, d1, d2))
+    return cur.fetchone()
+
+@named_query("query_terlaris")
 def query_terlaris(conn, toko_id, limit=10):
     cur = conn.cursor()
     cur.execute("""
-        SELECT barcode, item_nama, total_qty, total_penjualan, total_laba
-        FROM v_laporan_barang_terlaris
+        SELECT barcode, item_nama, SUM(total_qty) AS total_qty,
+               SUM(total_penjualan), SUM(total_laba)
+        FROM rekap_harian_barang
         WHERE toko_id = %s
+        GROUP BY barcode, item_nama
         ORDER BY total_qty DESC
         LIMIT %s
     """, (toko_id, limit))
     return cur.fetchall()
 
+@named_query("query_detail_barang_hari_ini")
+def query_detail_barang_hari_ini(conn, toko_id, barcode, harga):
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT LEFT(p.client_tx_id::text, 8) AS tx8,
+               p.tanggal,
+               COALESCE(pb.nama,'') AS pembeli,
+               COALESCE(pb.no_hp,'') AS no_hp,
+               d.qty
+        FROM penjualan p
+        JOIN penjualan_detail d ON d.penjualan_id = p.id AND d.tanggal = p.tanggal
+        LEFT JOIN pembeli pb ON pb.id = p.pembeli_id
+        WHERE p.tanggal >= CURRENT_DATE AND p.tanggal < CURRENT_DATE + 1
+          AND d.tanggal >= CURRENT_DATE AND d.tanggal < CURRENT_DATE + 1
+          AND p.toko_id = %s
+          AND d.barcode = %s
+          AND d.harga_jual = %s
+        ORDER BY p.tanggal
+    """, (toko_id, barcode, harga))
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+@named_query("query_nota")
+def query_nota(conn, ids=None, toko_id=None, d1=None, d2=None, limit=None, after=None):
+    """
+    Header + item nota dalam 1 query (item digabung json_agg per transaksi).
+    Filter: ids, toko_id, dan/atau rentang d1..d2; urut (tanggal, id).
+    after = (tanggal, id) untuk keyset pagination.
+    Return: [{header:{...}, items:[...]}]
+    """
+    where, params = [], []
+    if ids is not None:
+        where.append("p.id = ANY(%s)")
+        params.append(list(ids))
+    if toko_id is not None:
+        where.append("p.toko_id = %s")
+        params.append(toko_id)
+    if d1 is not None:
+        where.append("p.tanggal >= %s AND p.tanggal < %s")
+        params += _date_bounds(d1, d2)
+    if after:
+        where.append("(p.tanggal, p.id) > (%s, %s)")
+        params += list(after)
+    sql = """
+        SELECT p.id, p.client_tx_id, p.tanggal, p.metode_bayar,
+               p.bayar, p.kembalian,
+               COALESCE(pb.nama,''), COALESCE(pb.no_hp,''),
+               COALESCE((
+                   SELECT json_agg(json_build_object(
+                              'nama', d.nama, 'qty', d.qty,
+                              'harga_jual', d.harga_jual, 'harga_beli', d.harga_beli,
+                              'potongan', d.potongan) ORDER BY d.id)
+                   FROM penjualan_detail d
+                   WHERE d.penjualan_id = p.id AND d.tanggal = p.tanggal
+               ), '[]'::json)
+        FROM penjualan p
+        LEFT JOIN pembeli pb ON pb.id = p.pembeli_id
+    """
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY p.tanggal, p.id"
+    if limit:
+        sql += " LIMIT %s"
+        params.append(limit)
+
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    hasil = [{
+        "header": {
+            "id": h[0],
+            "client_tx_id": str(h[1]),
+            "tanggal": h[2].isoformat(),
+            "metode_bayar": h[3],
+            "bayar": float(h[4] or 0),
+            "kembalian": float(h[5] or 0),
+            "pembeli_nama": h[6],
+            "no_hp": h[7],
+        },
+        "items": [{
+            "nama": it["nama"],
+            "qty": int(it["qty"]),
+            "harga_jual": float(it["harga_jual"]),
+            "harga_beli": float(it["harga_beli"]),
+            "potongan": float(it["potongan"] or 0),
+        } for it in h[8]],
+    } for h in cur.fetchall()]
+    cur.close()
+    return hasil
+
+DASHBOARD_PARALLEL = os.getenv("DASHBOARD_PARALLEL", "true").lower() in ("1", "true", "yes")
+query_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("DASHBOARD_WORKERS", 8)),
+    thread_name_prefix="query",
+)
+
+def run_queries(tasks, cache=None, pool=None):
+    """
+    Jalankan beberapa query_*() yang saling independen.
+    tasks: {nama: (fn, args)} → fn(conn, *args).
+    cache: {nama: report_cache.entry(...)} — yang hit tidak dijalankan.
+    pool: sumber koneksi (mis. get_read_pool(...)); default primary.
+    Return ({nama: hasil}, {nama: durasi_detik}).
+
+    Dengan DASHBOARD_PARALLEL (default) tiap query jalan di thread sendiri dengan
+    koneksi pool sendiri, jadi latensi ≈ query terlambat, bukan jumlah semuanya.
+    Tanpa itu semua jalan berurutan di koneksi request (untuk pembanding).
+    """
+    def timed(fn, conn, args):
+        t0 = time.perf_counter()
+        result = fn(conn, *args)
+        return result, time.perf_counter() - t0
+
+    def run_pooled(fn, args):
+        with (pool or get_pool()).connection() as conn:
+            return timed(fn, conn, args)
+
+    hasil, durasi = {}, {}
+    cache = cache or {}
+    for nama, entry in cache.items():
+        value = report_cache.get(entry)
+        if value is not _MISS:
+            hasil[nama], durasi[nama] = value, 0.0
+    tasks = {nama: t for nama, t in tasks.items() if nama not in hasil}
+
+    if DASHBOARD_PARALLEL:
+        futures = {nama: query_executor.submit(run_pooled, fn, args)
+                   for nama, (fn, args) in tasks.items()}
+        for nama, fut in futures.items():
+            hasil[nama], durasi[nama] = fut.result()
+    else:
+        with (pool.connection() if pool is not None else nullcontext(get_db())) as conn:
+            for nama, (fn, args) in tasks.items():
+                hasil[nama], durasi[nama] = timed(fn, conn, args)
+
+    for nama in tasks:
+        if nama in cache:
+            report_cache.put(cache[nama], hasil[nama])
+    return hasil, durasi
+
+@named_query("upsert_katalog")
+def upsert_katalog(cur, items):
+    """
+    Perbarui barang_katalog (tabel ber-index untuk /api/barang/search) dari
+    item transaksi yang baru masuk. items: [(item_dict, tanggal_transaksi, toko_id)].
+    Data barang hanya ditimpa oleh transaksi yang lebih baru. updated_at
+    (versi /api/all-barang) hanya maju kalau nama/harga benar-benar berubah;
+    clock_timestamp(), bukan now(), supaya dekat dengan saat commit.
+    Keanggotaan barang per toko (barang_katalog_toko) ikut dicatat.
+    """
+    terbaru = {}
+    for item, tanggal, _ in items:
+        lama = terbaru.get(item["barcode"])
+        if lama is None or (tanggal is not None and (lama[4] is None or tanggal >= lama[4])):
+            terbaru[item["barcode"]] = (item["barcode"], item["nama"],
+                                        item["harga_jual"], item["harga_beli"], tanggal)
+    if not terbaru:
+        return
+    execute_values(cur, """
+        INSERT INTO barang_katalog
+        (barcode, nama, harga_jual, harga_beli, terakhir_dibeli, updated_at)
+        VALUES %s
+        ON CONFLICT (barcode) DO UPDATE
+        SET nama = EXCLUDED.nama,
+            harga_jual = EXCLUDED.harga_jual,
+            harga_beli = EXCLUDED.harga_beli,
+            terakhir_dibeli = EXCLUDED.terakhir_dibeli,
+            updated_at = CASE
+                WHEN (barang_katalog.nama, barang_katalog.harga_jual, barang_katalog.harga_beli)
+                     IS DISTINCT FROM (EXCLUDED.nama, EXCLUDED.harga_jual, EXCLUDED.harga_beli)
+                THEN EXCLUDED.updated_at
+                ELSE barang_katalog.updated_at
+            END
+        WHERE barang_katalog.terakhir_dibeli IS NULL
+           OR EXCLUDED.terakhir_dibeli >= barang_katalog.terakhir_dibeli
+    """, sorted(terbaru.values(), key=lambda r: r[0]),   # urut barcode: urutan lock konsisten
+        template="(%s, %s, %s, %s, %s, clock_timestamp())", page_size=1000)
+    execute_values(cur, """
+        INSERT INTO barang_katalog_toko (toko_id, barcode)
+        VALUES %s
+        ON CONFLICT DO NOTHING
+    """, sorted({(toko_id, item["barcode"]) for item, _, toko_id in items}), page_size=1000)
+
+@named_query("refresh_rekap")
+def refresh_rekap(cur, toko_id, days):
+    """
+    Hitung ulang rollup rekap_harian & rekap_harian_barang untuk satu toko
+    pada tanggal-tanggal `days`. Dipanggil di dalam transaksi yang sama
+    dengan insert penjualan, jadi ikut commit/rollback.
+
+    Agregasi langsung dari penjualan/penjualan_detail dengan batas per hari
+    setengah-terbuka (tanggal >= h AND tanggal < h + 1) plus batas total
+    min..max sebagai konstanta, supaya index (toko_id, tanggal) dan
+    pemangkasan partisi terpakai; lewat view sumber (filter DATE(p.tanggal))
+    setiap sync mengagregasi ulang seluruh riwayat toko.
+    """
+    days = sorted(set(days))
+    if not days:
+        return
+    awal, akhir = _date_bounds(days[0], days[-1])
+    # serialisasi per toko: dua sync bersamaan tidak boleh saling dobel insert
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext('rekap_harian'), %s)", (toko_id,))
+    params = {"toko_id": toko_id, "days": days, "awal": awal, "akhir": akhir}
+
+    cur.execute("DELETE FROM rekap_harian WHERE toko_id = %s AND tgl = ANY(%s::date[])",
+                (toko_id, days))
+    cur.execute("""
+        INSERT INTO rekap_harian
+        (toko_id, tgl, jml_transaksi, jml_item, total_omzet, total_laba)
+        SELECT p.toko_id, h.tgl,
+               COUNT(DISTINCT p.id),
+               COALESCE(SUM(d.qty), 0),
+               COALESCE(SUM(d.qty * d.harga_jual - COALESCE(d.potongan, 0)), 0),
+               COALESCE(SUM(d.qty * (d.harga_jual - d.harga_beli) - COALESCE(d.potongan, 0)), 0)
+        FROM unnest(%(days)s::date[]) AS h(tgl)
+        JOIN penjualan p
+          ON p.tanggal >= h.tgl AND p.tanggal < h.tgl + 1
+        LEFT JOIN penjualan_detail d
+          ON d.penjualan_id = p.id AND d.tanggal = p.tanggal
+         AND d.tanggal >= %(awal)s AND d.tanggal < %(akhir)s
+        WHERE p.toko_id = %(toko_id)s
+          AND p.tanggal >= %(awal)s AND p.tanggal < %(akhir)s
+        GROUP BY p.toko_id, h.tgl
+    """, params)
+
+    cur.execute("DELETE FROM rekap_harian_barang WHERE toko_id = %s AND tgl = ANY(%s::date[])",
+                (toko_id, days))
+    cur.execute("""
+        INSERT INTO rekap_harian_barang
+        (toko_id, tgl, barcode, item_nama, harga_beli, harga_jual,
+         total_qty, total_penjualan, total_laba)
+        SELECT p.toko_id, h.tgl, d.barcode, d.nama, d.harga_beli, d.harga_jual,
+               SUM(d.qty),
+               SUM(d.qty * d.harga_jual - COALESCE(d.potongan, 0)),
+               SUM(d.qty * (d.harga_jual - d.harga_beli) - COALESCE(d.potongan, 0))
+        FROM unnest(%(days)s::date[]) AS h(tgl)
+        JOIN penjualan p
+          ON p.tanggal >= h.tgl AND p.tanggal < h.tgl + 1
+        JOIN penjualan_detail d
+          ON d.penjualan_id = p.id AND d.tanggal = p.tanggal
+        WHERE p.toko_id = %(toko_id)s
+          AND p.tanggal >= %(awal)s AND p.tanggal < %(akhir)s
+          AND d.tanggal >= %(awal)s AND d.tanggal < %(akhir)s
+        GROUP BY p.toko_id, h.tgl, d.barcode, d.nama, d.harga_beli, d.harga_jual
+    """, params)
+
+NOTIFY_IDS_MAX = 200   # payload NOTIFY dibatasi 8000 byte
+
+def notify_penjualan(cur, toko_id, rows):
+    """
+    Kabari stream /api/penjualan/stream (lewat PenjualanFeed) bahwa transaksi
+    rows [(id, tgl)] toko ini masuk. NOTIFY ikut transaksi: baru terkirim
+    saat commit, dan hilang kalau rollback.
+    """
+    rows = sorted(rows)
+    for i in range(0, len(rows), NOTIFY_IDS_MAX):
+        chunk = rows[i:i + NOTIFY_IDS_MAX]
+        cur.execute("SELECT pg_notify(%s, %s)", (PENJUALAN_CHANNEL, json.dumps({
+            "toko_id": toko_id,
+            "ids": [pid for pid, _ in chunk],
+            "tgl": sorted({tgl.isoformat() for _, tgl in chunk}),
+        })))
+
 # =========================================
 # 4. Helper Export
 # =========================================
 
+EXPORT_BATCH_SIZE = 2000
+
+def iter_query(conn, name, sql, params, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Jalankan query di server-side (named) cursor dan yield baris satu per satu,
+    diambil dari server per `batch_size` baris — memori tetap datar berapa pun
+    jumlah barisnya.
+    """
+    cur = conn.cursor(name=name)
+    cur.itersize = batch_size
+    try:
+        with named_query(f"export:{name}"):
+            cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cur.close()
+
+def iter_export_transaksi(conn, toko_id, d1, d2, totals):
+    """Baris export transaksi siap tulis; total berjalan ditambahkan ke `totals`."""
+    rows = iter_query(conn, "export_transaksi", """
+        SELECT tanggal, tx8, nama, no_hp, metode_bayar, jml_item, total, laba
+        FROM v_penjualan_hari_ini
+        WHERE tanggal >= %s AND tanggal < %s
+          AND toko_id = %s
+        ORDER BY tanggal DESC
+    """, (*_date_bounds(d1, d2), toko_id))
+    for tgl, tx8, nama, hp, metode, jml_item, total, laba in rows:
+        totals["item"] += jml_item or 0
+        totals["total"] += float(total or 0)
+        totals["laba"] += float(laba or 0)
+        yield [
+            tgl.strftime("%d-%m-%Y %H:%M:%S"),
+            f"TX-{tx8.upper()}",
+            f"{nama or ''} {(hp or '')}".strip(),
+            metode,
+            jml_item,
+            float(total or 0),
+            float(laba or 0),
+        ]
+
+def iter_export_detail(conn, toko_id, d1, d2, totals):
+    """Baris export rekap barang siap tulis; total berjalan ditambahkan ke `totals`."""
+    rows = iter_query(conn, "export_detail", """
+        SELECT barcode, item_nama, harga_beli, harga_jual, total_qty, total_penjualan, total_laba
+        FROM rekap_harian_barang
+        WHERE toko_id = %s AND tgl BETWEEN %s AND %s
+        ORDER BY item_nama, harga_jual
+    """, (toko_id, d1, d2))
+    for barcode, item, hb, hj, qty, total, laba in rows:
+        totals["qty"] += qty or 0
+        totals["total"] += float(total or 0)
+        totals["laba"] += float(laba or 0)
+        yield [
+            barcode,
+            item,
+            float(hb or 0),
+            float(hj or 0),
+            int(qty or 0),
+            float(total or 0),
+            float(laba or 0),
+        ]
+
 def export_to_excel(headers, rows, judul, toko_nama, filename):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = judul[:30]
+    """
+    Tulis `rows` (boleh generator) ke workbook write-only. openpyxl menulis
+    baris langsung ke file sementara, jadi data tidak pernah utuh di memori.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=judul[:30])
 
     # Judul sheet
     ws.append([toko_nama])
@@ -195,18 +1501,68 @@ def export_to_excel(headers, rows, judul, toko_nama, filename):
     for row in rows:
         ws.append(row)
 
-    # Simpan ke memory
-    bio = io.BytesIO()
-    wb.save(bio)
-    bio.seek(0)
+    # Simpan ke file sementara (dihapus otomatis setelah response ditutup)
+    tmp = tempfile.TemporaryFile()
+    wb.save(tmp)
+    tmp.seek(0)
 
     return send_file(
-        bio,
+        tmp,
         as_attachment=True,
         download_name=filename,
         mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
 
+def _json_default(o):
+    """json.dumps fallback untuk nilai dari psycopg2 (Decimal, date, datetime)."""
+    if isinstance(o, Decimal):
+        return float(o)
+    if isinstance(o, (date, datetime)):
+        return o.isoformat()
+    raise TypeError(f"{type(o).__name__} tidak bisa di-serialize ke JSON")
+
+def stream_export(fmt, headers, keys, rows, total_row, filename):
+    """
+    Kirim `rows` (generator baris list) sebagai CSV atau NDJSON secara chunked,
+    langsung dari cursor. `total_row()` dipanggil setelah semua baris terkirim
+    dan mengembalikan baris TOTAL (list untuk CSV) dari total berjalan.
+    """
+    def gen_csv():
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        w.writerow(headers)
+        for i, row in enumerate(rows, 1):
+            w.writerow(row)
+            if i % EXPORT_BATCH_SIZE == 0:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        w.writerow([])
+        w.writerow(total_row())
+        yield buf.getvalue()
+
+    def gen_ndjson():
+        chunk = []
+        for row in rows:
+            chunk.append(json.dumps(dict(zip(keys, row)), ensure_ascii=False, default=_json_default))
+            if len(chunk) >= EXPORT_BATCH_SIZE:
+                yield "\n".join(chunk) + "\n"
+                chunk = []
+        total = {k: v for k, v in zip(keys, total_row()) if v not in ("", "TOTAL")}
+        chunk.append(json.dumps({"total": total}, ensure_ascii=False, default=_json_default))
+        yield "\n".join(chunk) + "\n"
+
+    if fmt == "csv":
+        body, mimetype = gen_csv(), "text/csv"
+    else:
+        body, mimetype = gen_ndjson(), "application/x-ndjson"
+
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
+
 # =========================================
 # 5. Auth Routes
 # =========================================
@@ -224,6 +1580,7 @@ def login():
         cur.close()
 
         if row and check_password_hash(row[1], password):
+            user_cache.pop(row[0])
             session["user_id"] = row[0]
             return redirect(url_for("kasir"))
         else:
@@ -233,6 +1590,7 @@ def login():
 
 @app.route("/logout")
 def logout():
+    user_cache.pop(session.get("user_id"))
     session.clear()
     return redirect(url_for("login"))
 
@@ -278,6 +1636,7 @@ def register():
             conn.commit()
 
             # auto login setelah register
+            user_cache.pop(user_id)
             session["user_id"] = user_id
             return redirect(url_for("kasir"))
         except Exception as e:
@@ -296,12 +1655,36 @@ def register():
 def kasir():
     """Halaman utama kasir."""
     user = get_current_user()   # sudah ada di app.py
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT id, nama, no_hp FROM pembeli ORDER BY nama")
-    pembeli = cur.fetchall()
-    cur.close()
-    return render_template("kasir.html", pembeli=pembeli, toko=user["toko"])
+    # daftar pembeli tidak lagi di-embed: diambil JS lewat /api/pembeli?since=
+    return render_template("kasir.html", toko=user["toko"])
+
+# Aset yang dipakai halaman kasir; di-precache service worker saat install.
+SHELL_ASSETS = (
+    "css/style.css",
+    "js/app.js",
+    "js/kasir-db.js",
+    "js/nota-utils.js",
+    "js/ua-parser.min.js",
+    "js/esc-pos-encoder.umd.min.js",
+    "manifest.json",
+)
+
+@app.route("/service-worker.js")
+def service_worker():
+    """
+    Service worker dengan scope "/" (file di /static/ hanya bisa mengontrol
+    /static/). Daftar precache berisi URL ber-hash dari asset_url(), jadi
+    deploy yang mengubah aset otomatis menghasilkan SW (dan cache) versi baru.
+    """
+    precache = [asset_url(p) for p in SHELL_ASSETS]
+    version = hashlib.sha256("\n".join(precache).encode()).hexdigest()[:10]
+    resp = make_response(render_template(
+        "service-worker.js", precache=precache, version=version,
+        kasir_db_url=asset_url("js/kasir-db.js"),
+    ))
+    resp.mimetype = "application/javascript"
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
 
 @app.route("/penjualan")
 @login_required
@@ -309,20 +1692,30 @@ def penjualan():
     user = get_current_user()
     d1, d2 = get_date_range_from_request()
 
-    conn = get_db()
-    rows = query_penjualan(conn, user["toko"]["id"], d1, d2)
-    detail_rows = query_detail(conn, user["toko"]["id"], d1, d2)
-    ringkasan_rows = query_ringkasan(conn, user["toko"]["id"], d1, d2)
-    terlaris_rows = query_terlaris(conn, user["toko"]["id"])
-
-    total_transaksi = sum(r[1] for r in ringkasan_rows)
-    total_item = sum(r[2] for r in ringkasan_rows)
-    total_omzet = sum(float(r[3] or 0) for r in ringkasan_rows)
-    total_laba = sum(float(r[4] or 0) for r in ringkasan_rows)
+    toko_id = user["toko"]["id"]
+    hasil, durasi = run_queries({
+        "penjualan": (query_penjualan, (toko_id, d1, d2, PENJUALAN_PAGE_SIZE + 1)),
+        "detail": (query_detail, (toko_id, d1, d2)),
+        "ringkasan": (query_ringkasan, (toko_id, d1, d2)),
+        "ringkasan_total": (query_ringkasan_total, (toko_id, d1, d2)),
+        "terlaris": (query_terlaris, (toko_id,)),
+    }, cache={
+        "detail": report_cache.entry("detail", toko_id, d1, d2),
+        "ringkasan": report_cache.entry("ringkasan", toko_id, d1, d2),
+        "ringkasan_total": report_cache.entry("ringkasan_total", toko_id, d1, d2),
+        "terlaris": report_cache.entry("terlaris", toko_id),
+    }, pool=get_read_pool(fresh=includes_today(d2)))
+    rows, next_cursor = _penjualan_page(hasil["penjualan"], PENJUALAN_PAGE_SIZE)
+    detail_rows = hasil["detail"]
+    ringkasan_rows = hasil["ringkasan"]
+    terlaris_rows = hasil["terlaris"]
+    total_transaksi, total_item, total_omzet, total_laba = hasil["ringkasan_total"]
+    g.server_timing = durasi
 
     return render_template(
         "penjualan_hari_ini.html",
         rows=rows,
+        next_cursor=next_cursor,
         detail_rows=detail_rows,
         ringkasan_rows=ringkasan_rows,
         terlaris_rows=terlaris_rows,
@@ -333,6 +1726,19 @@ def penjualan():
         start=d1.strftime("%Y-%m-%d"),
         end=d2.strftime("%Y-%m-%d"),
         keterangan_tanggal=format_keterangan_tanggal(d1, d2),
+        live=includes_today(d2),
+        toko=user["toko"]
+    )
+
+@app.route("/laporan")
+@login_required
+def laporan():
+    user = get_current_user()
+    d1, d2 = get_date_range_from_request()
+    return render_template(
+        "laporan.html",
+        start=d1.strftime("%Y-%m-%d"),
+        end=d2.strftime("%Y-%m-%d"),
         toko=user["toko"]
     )
 
@@ -348,17 +1754,22 @@ def print_transaksi_hari_ini():
     d1 = _parse_date(request.args.get("start", ""), today)
     d2 = _parse_date(request.args.get("end", ""), today)
 
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT tanggal, tx8, nama, no_hp, metode_bayar, jml_item, total, laba
-        FROM v_penjualan_hari_ini
-        WHERE DATE(tanggal) BETWEEN %s AND %s
-          AND toko_id = %s
-        ORDER BY tanggal DESC
-    """, (d1, d2, user["toko"]["id"]))
-    rows = cur.fetchall()
-    cur.close()
+    toko_id = user["toko"]["id"]
+
+    def compute():
+        cur = get_read_db(fresh=includes_today(d2)).cursor()
+        cur.execute("""
+            SELECT tanggal, tx8, nama, no_hp, metode_bayar, jml_item, total, laba
+            FROM v_penjualan_hari_ini
+            WHERE tanggal >= %s AND tanggal < %s
+              AND toko_id = %s
+            ORDER BY tanggal DESC
+        """, (*_date_bounds(d1, d2), toko_id))
+        rows = cur.fetchall()
+        cur.close()
+        return rows
+
+    rows = report_cache.cached("print_transaksi", toko_id, d1, d2, compute)
 
     if d1 == d2:
         hari = HARI_ID[d1.strftime("%A")]
@@ -385,17 +1796,9 @@ def print_detail_hari_ini():
     d1 = _parse_date(request.args.get("start", ""), today)
     d2 = _parse_date(request.args.get("end", ""), today)
 
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT barcode, item_nama, harga_beli, harga_jual, total_qty, total_penjualan, total_laba
-        FROM v_penjualan_rekap_barang_hari_ini
-        WHERE toko_id = %s
-          AND tgl BETWEEN %s AND %s
-        ORDER BY item_nama, harga_jual
-    """, (user["toko"]["id"], d1, d2))
-    rows = cur.fetchall()
-    cur.close()
+    toko_id = user["toko"]["id"]
+    rows = report_cache.cached("detail", toko_id, d1, d2,
+                               lambda: query_detail(get_read_db(fresh=includes_today(d2)), toko_id, d1, d2))
 
     if d1 == d2:
         hari = HARI_ID[d1.strftime("%A")]
@@ -420,37 +1823,13 @@ def export_transaksi_hari_ini_xlsx():
     user = get_current_user()
     d1, d2 = get_date_range_from_request()
 
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT tanggal, tx8, nama, no_hp, metode_bayar, jml_item, total, laba
-        FROM v_penjualan_hari_ini
-        WHERE DATE(tanggal) BETWEEN %s AND %s
-          AND toko_id = %s
-        ORDER BY tanggal DESC
-    """, (d1, d2, user["toko"]["id"]))
-    data = cur.fetchall()
-    cur.close()
-
-    # konversi ke baris siap tulis
-    rows = []
-    t_item, t_total, t_laba = 0, 0, 0
-    for tgl, tx8, nama, hp, metode, jml_item, total, laba in data:
-        rows.append([
-            tgl.strftime("%d-%m-%Y %H:%M:%S"),
-            f"TX-{tx8.upper()}",
-            f"{nama or ''} {(hp or '')}".strip(),
-            metode,
-            jml_item,
-            float(total or 0),
-            float(laba or 0),
-        ])
-        t_item += jml_item or 0
-        t_total += float(total or 0)
-        t_laba += float(laba or 0)
+    conn = get_read_db(fresh=includes_today(d2))
+    totals = {"item": 0, "total": 0, "laba": 0}
 
-    rows.append([])
-    rows.append(["TOTAL", "", "", "", t_item, t_total, t_laba])
+    def rows():
+        yield from iter_export_transaksi(conn, user["toko"]["id"], d1, d2, totals)
+        yield []
+        yield ["TOTAL", "", "", "", totals["item"], totals["total"], totals["laba"]]
 
     judul = (f"Laporan Transaksi {d1.strftime('%d %b %Y')}"
              if d1 == d2 else
@@ -459,7 +1838,7 @@ def export_transaksi_hari_ini_xlsx():
     headers = ["Waktu", "No Transaksi", "Pembeli", "Metode", "Item", "Total", "Laba"]
     filename = f"transaksi_{d1:%Y%m%d}_{d2:%Y%m%d}.xlsx"
 
-    return export_to_excel(headers, rows, judul, user["toko"]["nama"], filename)
+    return export_to_excel(headers, rows(), judul, user["toko"]["nama"], filename)
 
 @app.route("/penjualan-hari-ini/export-detail/xlsx")
 @login_required
@@ -467,36 +1846,13 @@ def export_detail_hari_ini_xlsx():
     user = get_current_user()
     d1, d2 = get_date_range_from_request()
 
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT barcode, item_nama, harga_beli, harga_jual, total_qty, total_penjualan, total_laba
-        FROM v_penjualan_rekap_barang_hari_ini
-        WHERE toko_id = %s
-          AND tgl BETWEEN %s AND %s
-        ORDER BY item_nama, harga_jual
-    """, (user["toko"]["id"], d1, d2))
-    data = cur.fetchall()
-    cur.close()
-
-    rows = []
-    gqty, gtotal, glaba = 0, 0, 0
-    for barcode, item, hb, hj, qty, total, laba in data:
-        rows.append([
-            barcode,
-            item,
-            float(hb or 0),
-            float(hj or 0),
-            int(qty or 0),
-            float(total or 0),
-            float(laba or 0),
-        ])
-        gqty += qty or 0
-        gtotal += float(total or 0)
-        glaba += float(laba or 0)
+    conn = get_read_db(fresh=includes_today(d2))
+    totals = {"qty": 0, "total": 0, "laba": 0}
 
-    rows.append([])
-    rows.append(["", "TOTAL", "", "", gqty, gtotal, glaba])
+    def rows():
+        yield from iter_export_detail(conn, user["toko"]["id"], d1, d2, totals)
+        yield []
+        yield ["", "TOTAL", "", "", totals["qty"], totals["total"], totals["laba"]]
 
     judul = (f"Laporan Rekap Barang {d1.strftime('%d %b %Y')}"
              if d1 == d2 else
@@ -505,7 +1861,45 @@ def export_detail_hari_ini_xlsx():
     headers = ["Barcode", "Nama Barang", "Harga Beli", "Harga Jual", "Qty", "Total Penjualan", "Total Laba"]
     filename = f"rekap_barang_{d1:%Y%m%d}_{d2:%Y%m%d}.xlsx"
 
-    return export_to_excel(headers, rows, judul, user["toko"]["nama"], filename)
+    return export_to_excel(headers, rows(), judul, user["toko"]["nama"], filename)
+
+@app.route("/penjualan-hari-ini/export-transaksi/<any(csv, ndjson):fmt>")
+@login_required
+def export_transaksi_hari_ini_stream(fmt):
+    user = get_current_user()
+    d1, d2 = get_date_range_from_request()
+
+    conn = get_read_db(fresh=includes_today(d2))
+    totals = {"item": 0, "total": 0, "laba": 0}
+    rows = iter_export_transaksi(conn, user["toko"]["id"], d1, d2, totals)
+
+    return stream_export(
+        fmt,
+        ["Waktu", "No Transaksi", "Pembeli", "Metode", "Item", "Total", "Laba"],
+        ["waktu", "no_transaksi", "pembeli", "metode", "item", "total", "laba"],
+        rows,
+        lambda: ["TOTAL", "", "", "", totals["item"], totals["total"], totals["laba"]],
+        f"transaksi_{d1:%Y%m%d}_{d2:%Y%m%d}",
+    )
+
+@app.route("/penjualan-hari-ini/export-detail/<any(csv, ndjson):fmt>")
+@login_required
+def export_detail_hari_ini_stream(fmt):
+    user = get_current_user()
+    d1, d2 = get_date_range_from_request()
+
+    conn = get_read_db(fresh=includes_today(d2))
+    totals = {"qty": 0, "total": 0, "laba": 0}
+    rows = iter_export_detail(conn, user["toko"]["id"], d1, d2, totals)
+
+    return stream_export(
+        fmt,
+        ["Barcode", "Nama Barang", "Harga Beli", "Harga Jual", "Qty", "Total Penjualan", "Total Laba"],
+        ["barcode", "nama_barang", "harga_beli", "harga_jual", "qty", "total_penjualan", "total_laba"],
+        rows,
+        lambda: ["", "TOTAL", "", "", totals["qty"], totals["total"], totals["laba"]],
+        f"rekap_barang_{d1:%Y%m%d}_{d2:%Y%m%d}",
+    )
 
 # ==========================================
 # 8. API Routes
@@ -515,25 +1909,8 @@ def export_detail_hari_ini_xlsx():
 @login_required
 def api_detail_barang(barcode, harga):
     user = get_current_user()
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT LEFT(p.client_tx_id::text, 8) AS tx8,
-               p.tanggal,
-               COALESCE(pb.nama,'') AS pembeli,
-               COALESCE(pb.no_hp,'') AS no_hp,
-               d.qty
-        FROM penjualan p
-        JOIN penjualan_detail d ON d.penjualan_id = p.id
-        LEFT JOIN pembeli pb ON pb.id = p.pembeli_id
-        WHERE DATE(p.tanggal) = CURRENT_DATE
-          AND p.toko_id = %s
-          AND d.barcode = %s
-          AND d.harga_jual = %s
-        ORDER BY p.tanggal
-    """, (user["toko"]["id"], barcode, harga))
-    rows = cur.fetchall()
-    cur.close()
+    conn = get_read_db(fresh=True)
+    rows = query_detail_barang_hari_ini(conn, user["toko"]["id"], barcode, harga)
 
     result = []
     for tx8, tanggal, pembeli, no_hp, qty in rows:
@@ -546,58 +1923,299 @@ def api_detail_barang(barcode, harga):
         })
     return jsonify(result)
 
-@app.route("/api/penjualan/<int:pid>")
-def api_penjualan_detail(pid):
+@app.route("/api/laporan/harian")
+@login_required
+def api_laporan_harian():
     """
-    Ambil detail transaksi berdasarkan ID penjualan.
-    Return JSON: {header:{...}, items:[...]}
+    Ringkasan per hari dari rollup rekap_harian, keyset pagination per tanggal.
+    Query: start, end, limit, cursor (dari next_cursor respons sebelumnya)
+    Return JSON: {rows:[{tgl, jumlah, total, laba}], next_cursor,
+                  gjumlah, gtotal, glaba}  (g* hanya di halaman pertama)
+    Cursor rusak → 400.
     """
+    user = get_current_user()
+    toko_id = user["toko"]["id"]
+    d1, d2 = get_date_range_from_request()
+    limit = _page_limit()
+    try:
+        after = _cursor_arg(date.fromisoformat)   # cursor = tgl terakhir "YYYY-MM-DD"
+    except ValueError as e:
+        return jsonify({"status": "error", "msg": str(e)}), 400
+
     conn = get_db()
     cur = conn.cursor()
+    cur.execute("""
+        SELECT tgl, jml_transaksi, total_omzet, total_laba
+        FROM rekap_harian
+        WHERE toko_id = %s AND tgl BETWEEN %s AND %s
+          AND (%s::date IS NULL OR tgl > %s::date)
+        ORDER BY tgl
+        LIMIT %s
+    """, (toko_id, d1, d2, after, after, limit + 1))
+    rows = cur.fetchall()
+    cur.close()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1][0])
+
+    result = {
+        "rows": [{
+            "tgl": r[0].isoformat(),
+            "jumlah": int(r[1] or 0),
+            "total": float(r[2] or 0),
+            "laba": float(r[3] or 0),
+        } for r in rows],
+        "next_cursor": next_cursor,
+    }
+    if after is None:
+        jumlah, _, omzet, laba = report_cache.cached(
+            "ringkasan_total", toko_id, d1, d2,
+            lambda: query_ringkasan_total(conn, toko_id, d1, d2))
+        result.update(gjumlah=int(jumlah), gtotal=float(omzet), glaba=float(laba))
+    return jsonify(result)
+
+def _barcode_cursor(v):
+    """Cursor per-barang = barcode terakhir (string)."""
+    if not isinstance(v, str):
+        raise ValueError("cursor tidak valid")
+    return v
+
+@app.route("/api/laporan/per-barang")
+@login_required
+def api_laporan_per_barang():
+    """
+    Total per barang (barcode) dalam rentang tanggal dari rollup
+    rekap_harian_barang, urut barcode dengan keyset pagination.
+    Query: start, end, q (cari barcode / nama), limit, cursor
+    Return JSON: {rows:[{barcode, nama, qty, omzet, laba}], next_cursor,
+                  gqty, gomzet, glaba}  (g* hanya di halaman pertama)
+    Cursor rusak → 400.
+    """
+    user = get_current_user()
+    toko_id = user["toko"]["id"]
+    d1, d2 = get_date_range_from_request()
+    limit = _page_limit()
     try:
-        # Header penjualan
-        cur.execute("""
-            SELECT p.id, p.client_tx_id, p.tanggal, p.metode_bayar, 
-                p.bayar, p.kembalian,
-                COALESCE(pb.nama,''), COALESCE(pb.no_hp,'')
-            FROM penjualan p
-            LEFT JOIN pembeli pb ON pb.id = p.pembeli_id
-            WHERE p.id = %s
-        """, (pid,))
-        h = cur.fetchone()
-        if not h:
-            return jsonify({"status": "error", "msg": "not found"}), 404
-
-        header = {
-            "id": h[0],
-            "client_tx_id": str(h[1]),   # ✅ pakai UUID dari DB
-            "tanggal": h[2].isoformat(),
-            "metode_bayar": h[3],
-            "bayar": float(h[4] or 0),
-            "kembalian": float(h[5] or 0),
-            "pembeli_nama": h[6],
-            "no_hp": h[7],
-        }
+        after = _cursor_arg(_barcode_cursor)
+    except ValueError as e:
+        return jsonify({"status": "error", "msg": str(e)}), 400
+    q = (request.args.get("q") or "").strip()
+    pola = _like_pattern(q) if q else None
 
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT barcode, MAX(item_nama), SUM(total_qty), SUM(total_penjualan), SUM(total_laba)
+        FROM rekap_harian_barang
+        WHERE toko_id = %s AND tgl BETWEEN %s AND %s
+          AND (%s::text IS NULL OR barcode > %s)
+          AND (%s::text IS NULL OR barcode ILIKE %s OR item_nama ILIKE %s)
+        GROUP BY barcode
+        ORDER BY barcode
+        LIMIT %s
+    """, (toko_id, d1, d2, after, after, pola, pola, pola, limit + 1))
+    rows = cur.fetchall()
 
-        # Detail item
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1][0])
+
+    result = {
+        "rows": [{
+            "barcode": r[0],
+            "nama": r[1],
+            "qty": float(r[2] or 0),
+            "omzet": float(r[3] or 0),
+            "laba": float(r[4] or 0),
+        } for r in rows],
+        "next_cursor": next_cursor,
+    }
+    if after is None:
         cur.execute("""
-            SELECT nama, qty, harga_jual, harga_beli, potongan
-            FROM penjualan_detail
-            WHERE penjualan_id = %s
-            ORDER BY id
-        """, (pid,))
-        items = [{
-            "nama": r[0],
-            "qty": int(r[1]),
-            "harga_jual": float(r[2]),
-            "harga_beli": float(r[3]),
-            "potongan": float(r[4] or 0)
-        } for r in cur.fetchall()]
-
-        return jsonify({"header": header, "items": items})
-    finally:
-        cur.close()
+            SELECT COALESCE(SUM(total_qty), 0), COALESCE(SUM(total_penjualan), 0),
+                   COALESCE(SUM(total_laba), 0)
+            FROM rekap_harian_barang
+            WHERE toko_id = %s AND tgl BETWEEN %s AND %s
+              AND (%s::text IS NULL OR barcode ILIKE %s OR item_nama ILIKE %s)
+        """, (toko_id, d1, d2, pola, pola, pola))
+        qty, omzet, laba = cur.fetchone()
+        result.update(gqty=float(qty), gomzet=float(omzet), glaba=float(laba))
+    cur.close()
+    return jsonify(result)
+
+@app.route("/api/penjualan")
+@login_required
+def api_penjualan_list():
+    """
+    Daftar transaksi untuk tombol "Muat lagi" di halaman penjualan,
+    keyset pagination (tanggal, id) DESC.
+    Query: start, end, limit, cursor (dari next_cursor respons sebelumnya)
+    Return JSON: {rows:[{id, tanggal, tx8, nama, no_hp, metode, total, laba, jml_item}],
+                  next_cursor}
+    Cursor rusak → 400.
+    """
+    user = get_current_user()
+    toko_id = user["toko"]["id"]
+    d1, d2 = get_date_range_from_request()
+    limit = _page_limit(default=PENJUALAN_PAGE_SIZE)
+    try:
+        after = _cursor_arg(_tanggal_id_cursor)
+    except ValueError as e:
+        return jsonify({"status": "error", "msg": str(e)}), 400
+
+    rows = query_penjualan(get_db(), toko_id, d1, d2, limit + 1, after)
+    rows, next_cursor = _penjualan_page(rows, limit)
+    return jsonify({
+        "rows": [_penjualan_json(r) for r in rows],
+        "next_cursor": next_cursor,
+    })
+
+def _penjualan_json(r):
+    """Satu baris query_penjualan → dict JSON (sama dengan baris tabel Transaksi)."""
+    return {
+        "id": r[0],
+        "tanggal": r[1].strftime("%d-%m-%Y %H:%M:%S"),
+        "tx8": r[2],
+        "nama": r[3],
+        "no_hp": r[4],
+        "metode": r[5],
+        "total": float(r[6] or 0),
+        "laba": float(r[7] or 0),
+        "jml_item": int(r[8] or 0),
+    }
+
+PENJUALAN_STREAM_HEARTBEAT = 15      # detik; komentar SSE supaya proxy tidak memutus
+PENJUALAN_STREAM_MAX_AGE = int(os.getenv("PENJUALAN_STREAM_MAX_AGE", 600))
+PENJUALAN_STREAM_CATCHUP = 50        # baris terbaru yang dikirim ulang saat resync
+
+def _penjualan_live(toko_id, d1, d2, ids=None):
+    """
+    Payload event stream: transaksi `ids` (atau yang terbaru, untuk resync) +
+    total rentang. Selalu dari primary dan tanpa report_cache: NOTIFY sampai
+    begitu commit, sebelum replica menyusul / generasi cache dinaikkan.
+    """
+    with get_pool().connection() as conn:
+        if ids:
+            rows = query_penjualan(conn, toko_id, d1, d2, ids=ids)
+        else:
+            rows = query_penjualan(conn, toko_id, d1, d2, PENJUALAN_STREAM_CATCHUP)
+        total = query_ringkasan_total(conn, toko_id, d1, d2)
+    return {
+        "rows": [_penjualan_json(r) for r in rows],
+        "total": {
+            "transaksi": int(total[0] or 0),
+            "item": int(total[1] or 0),
+            "omzet": float(total[2] or 0),
+            "laba": float(total[3] or 0),
+        },
+    }
+
+@app.route("/api/penjualan/stream")
+@login_required
+def api_penjualan_stream():
+    """
+    Server-Sent Events untuk halaman penjualan: setiap sync transaksi toko ini
+    yang masuk rentang start..end mengirim event "penjualan"
+    {rows:[format /api/penjualan], total:{transaksi,item,omzet,laba}}.
+    Hanya untuk rentang yang memuat hari ini.
+
+    Koneksi ditutup server setelah PENJUALAN_STREAM_MAX_AGE detik; EventSource
+    menyambung ulang sendiri dengan Last-Event-ID, lalu dikirimi transaksi
+    terbaru + total supaya yang terlewat selama putus ikut tampil.
+    """
+    user = get_current_user()
+    toko_id = user["toko"]["id"]
+    d1, d2 = get_date_range_from_request()
+    if not includes_today(d2):
+        return jsonify({"status": "error", "msg": "stream hanya untuk rentang yang memuat hari ini"}), 400
+    q = penjualan_feed.subscribe(toko_id)
+    if q is None:
+        return jsonify({"status": "error", "msg": "server sibuk, coba lagi"}), 503
+    resync = "Last-Event-ID" in request.headers
+    start, end = d1.isoformat(), d2.isoformat()
+
+    def sse(data):
+        return f"id: {time.time_ns() // 1000}\nevent: penjualan\ndata: {json.dumps(data)}\n\n"
+
+    def events():
+        yield "retry: 5000\n\n"
+        if resync:
+            yield sse({**_penjualan_live(toko_id, d1, d2), "resync": True})
+        else:
+            yield "id: 0\ndata: {}\n\n"   # supaya sambung ulang membawa Last-Event-ID
+        batas = time.monotonic() + PENJUALAN_STREAM_MAX_AGE
+        while time.monotonic() < batas:
+            try:
+                event = q.get(timeout=PENJUALAN_STREAM_HEARTBEAT)
+            except queue.Empty:
+                yield ": ping\n\n"
+                continue
+            if event.get("resync"):
+                yield sse({**_penjualan_live(toko_id, d1, d2), "resync": True})
+            elif any(start <= tgl <= end for tgl in event.get("tgl", ())):
+                yield sse(_penjualan_live(toko_id, d1, d2, ids=event["ids"]))
+
+    resp = Response(events(), mimetype="text/event-stream")
+    # generator yang belum sempat jalan tidak menjalankan finally → lepas di sini
+    resp.call_on_close(lambda: penjualan_feed.unsubscribe(toko_id, q))
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
+
+@app.route("/api/penjualan/<int:pid>")
+def api_penjualan_detail(pid):
+    """
+    Ambil detail transaksi berdasarkan ID penjualan (1 query).
+    Return JSON: {header:{...}, items:[...]}
+    """
+    nota = query_nota(get_db(), ids=[pid])
+    if not nota:
+        return jsonify({"status": "error", "msg": "not found"}), 404
+    return jsonify(nota[0])
+
+NOTA_BULK_MAX = 500
+
+@app.route("/api/penjualan/nota", methods=["GET", "POST"])
+@login_required
+def api_penjualan_nota_bulk():
+    """
+    Banyak nota sekaligus (cetak ulang / WA massal) dalam 1 query.
+    Query/JSON: ids (list atau "1,2,3")  — atau —  start, end (+ limit, cursor)
+    Return JSON: {rows:[{header, items}], next_cursor}
+    Hanya transaksi milik toko user yang dikembalikan. Cursor rusak → 400.
+    """
+    user = get_current_user()
+    toko_id = user["toko"]["id"]
+    data = request.get_json(silent=True) or {}
+    ids = data.get("ids", request.args.get("ids"))
+    if isinstance(ids, str):
+        ids = [x for x in ids.split(",") if x.strip()]
+
+    conn = get_db()
+    if ids:
+        try:
+            ids = [int(x) for x in ids]
+        except (TypeError, ValueError):
+            return jsonify({"status": "error", "msg": "ids tidak valid"}), 400
+        if len(ids) > NOTA_BULK_MAX:
+            return jsonify({"status": "error", "msg": f"maksimal {NOTA_BULK_MAX} id"}), 400
+        return jsonify({"rows": query_nota(conn, ids=ids, toko_id=toko_id), "next_cursor": None})
+
+    d1, d2 = get_date_range_from_request()
+    limit = _page_limit(default=NOTA_BULK_MAX, maximum=NOTA_BULK_MAX)
+    try:
+        after = _cursor_arg(_tanggal_id_cursor)
+    except ValueError as e:
+        return jsonify({"status": "error", "msg": str(e)}), 400
+    rows = query_nota(conn, toko_id=toko_id, d1=d1, d2=d2, limit=limit + 1, after=after)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor([rows[-1]["header"]["tanggal"], rows[-1]["header"]["id"]])
+    return jsonify({"rows": rows, "next_cursor": next_cursor})
 
 @app.route("/api/barang/<barcode>")
 @login_required
@@ -621,23 +2239,119 @@ def api_barang(barcode):
         })
     return jsonify(None)
 
-@app.route("/api/all-barang")
-def api_all_barang():
+@app.route("/api/barang/search")
+@login_required
+def api_barang_search():
     """
-    Ambil semua barang yang pernah terbeli (cache master barang).
+    Cari barang untuk typeahead kasir, dari barang_katalog ber-index; hanya
+    barang yang pernah dijual di toko user (barang_katalog_toko).
+    Query: q (min 2 huruf), limit (default 10, maks 50)
+    Urutan: barcode persis, prefix barcode, prefix nama, lalu nama mengandung q;
+    di dalam tiap tingkat urut nama (lalu barcode), stabil antar panggilan.
     Return JSON: [{barcode, nama, harga_jual, harga_beli}, ...]
     """
+    toko_id = get_current_user()["toko"]["id"]
+    q = (request.args.get("q") or "").strip()
+    limit = _page_limit(default=10, maximum=50)
+    if len(q) < 2:
+        return jsonify([])
+
+    prefix = _like_pattern(q)[1:]          # 'q%'
     conn = get_db()
     cur = conn.cursor()
     cur.execute("""
-        SELECT barcode, nama, harga_jual, harga_beli
-        FROM v_barang_terbeli
-        ORDER BY nama
-    """)
+        (SELECT barcode, nama, harga_jual, harga_beli, 0 AS urut
+         FROM barang_katalog k WHERE barcode = %(q)s
+          AND EXISTS (SELECT 1 FROM barang_katalog_toko kt
+                      WHERE kt.toko_id = %(toko_id)s AND kt.barcode = k.barcode))
+        UNION ALL
+        (SELECT barcode, nama, harga_jual, harga_beli, 1
+         FROM barang_katalog k WHERE barcode LIKE %(prefix)s
+          AND EXISTS (SELECT 1 FROM barang_katalog_toko kt
+                      WHERE kt.toko_id = %(toko_id)s AND kt.barcode = k.barcode)
+         ORDER BY barcode LIMIT %(limit)s)
+        UNION ALL
+        (SELECT barcode, nama, harga_jual, harga_beli, 2
+         FROM barang_katalog k WHERE lower(nama) LIKE lower(%(prefix)s)
+          AND EXISTS (SELECT 1 FROM barang_katalog_toko kt
+                      WHERE kt.toko_id = %(toko_id)s AND kt.barcode = k.barcode)
+         ORDER BY lower(nama), barcode LIMIT %(limit)s)
+        UNION ALL
+        (SELECT barcode, nama, harga_jual, harga_beli, 3
+         FROM barang_katalog k WHERE length(%(q)s) >= 3 AND lower(nama) LIKE lower(%(sub)s)
+          AND EXISTS (SELECT 1 FROM barang_katalog_toko kt
+                      WHERE kt.toko_id = %(toko_id)s AND kt.barcode = k.barcode)
+         ORDER BY lower(nama), barcode LIMIT %(limit)s)
+        ORDER BY urut, lower(nama), barcode
+    """, {"q": q, "prefix": prefix, "sub": _like_pattern(q), "limit": limit,
+          "toko_id": toko_id})
+    rows = cur.fetchall()
+    cur.close()
+
+    hasil, seen = [], set()
+    for barcode, nama, hj, hb, _ in rows:
+        if barcode in seen:
+            continue
+        seen.add(barcode)
+        hasil.append({
+            "barcode": barcode,
+            "nama": nama,
+            "harga_jual": float(hj or 0),
+            "harga_beli": float(hb or 0),
+        })
+        if len(hasil) >= limit:
+            break
+    return jsonify(hasil)
+
+KATALOG_OVERLAP = 60   # detik; batas lama transaksi sync dari upsert_katalog sampai commit
+
+@app.route("/api/all-barang")
+def api_all_barang():
+    """
+    Ambil semua barang yang pernah terbeli (cache master barang), dari barang_katalog.
+    Tanpa `since`  → JSON: [{barcode, nama, harga_jual, harga_beli}, ...]
+    Dengan `since` → JSON: {version, full, rows:[...]} berisi hanya barang yang
+    berubah setelah `since` (versi dari respons sebelumnya; kosong = semua).
+
+    Versi = updated_at katalog (waktu server), tertinggal KATALOG_OVERLAP dari
+    sekarang: sync yang commit belakangan dengan updated_at sedikit lebih lama
+    masih masuk delta berikutnya. ETag = versi; If-None-Match yang cocok → 304
+    hanya kalau perubahan terakhir sudah lewat jendela itu.
+    """
+    conn = get_read_db(fresh=True)
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT MAX(updated_at), now() - %s * interval '1 second'
+        FROM barang_katalog
+    """, (KATALOG_OVERLAP,))
+    terbaru, aman = cur.fetchone()
+    version = min(terbaru, aman).isoformat() if terbaru else ""
+    etag = f"barang-{version}"
+
+    if terbaru is not None and terbaru <= aman and request.if_none_match.contains_weak(etag):
+        cur.close()
+        resp = make_response("", 304)
+        resp.set_etag(etag, weak=True)
+        return resp
+
+    delta = "since" in request.args
+    since = None
+    if delta:
+        try:
+            since = datetime.fromisoformat(request.args["since"])
+        except ValueError:
+            since = None
+
+    sql = "SELECT barcode, nama, harga_jual, harga_beli FROM barang_katalog"
+    params = []
+    if since is not None:
+        sql += " WHERE updated_at > %s::timestamptz"
+        params.append(since)
+    cur.execute(sql + " ORDER BY nama", params)
     rows = cur.fetchall()
     cur.close()
 
-    return jsonify([
+    items = [
         {
             "barcode": r[0],
             "nama": r[1],
@@ -645,48 +2359,135 @@ def api_all_barang():
             "harga_beli": float(r[3] or 0)
         }
         for r in rows
-    ])
+    ]
+    if delta:
+        resp = jsonify({"version": version, "full": since is None, "rows": items})
+    else:
+        resp = jsonify(items)
+    resp.set_etag(etag, weak=True)
+    resp.headers["X-Barang-Version"] = version
+    return resp
 
 @app.route("/api/pembeli")
+@login_required
 def api_pembeli():
     """
-    Ambil daftar pembeli dari database.
+    Daftar pembeli toko user (termasuk pembeli bersama, toko_id NULL).
+    Tanpa `since`  → JSON: [{id, nama, no_hp}, ...]
+    Dengan `since` → JSON: {version, full, rows:[...]} berisi hanya pembeli yang
+    berubah setelah `since` (versi dari respons sebelumnya; kosong = semua).
+    """
+    toko_id = get_current_user()["toko"]["id"]
+    delta = "since" in request.args
+    since = None
+    if delta:
+        try:
+            since = datetime.fromisoformat(request.args["since"])
+        except ValueError:
+            since = None
+
+    sql = """
+        SELECT id, nama, COALESCE(no_hp,''), updated_at
+        FROM pembeli
+        WHERE (toko_id = %s OR toko_id IS NULL)
+    """
+    params = [toko_id]
+    if since is not None:
+        sql += " AND updated_at > %s::timestamptz - interval '1 minute'"
+        params.append(since)
+    sql += " ORDER BY updated_at, id"
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    rows = cur.fetchall()
+    cur.close()
+
+    # jendela tumpang-tindih 1 menit: baris dari transaksi yang commit belakangan
+    # dengan updated_at lebih lama tidak terlewat; klien cukup menimpa per id
+    items = [{"id": r[0], "nama": r[1], "no_hp": r[2]} for r in rows]
+    if not delta:
+        return jsonify(sorted(items, key=lambda p: (p["nama"] or "").lower()))
+    terbaru = rows[-1][3] if rows else since
+    if rows and since is not None and since.tzinfo is not None:
+        terbaru = max(terbaru, since)   # baris tumpang-tindih bisa lebih lama dari since
+    version = terbaru.isoformat() if terbaru else ""
+    return jsonify({"version": version, "full": since is None, "rows": items})
+
+@app.route("/api/pembeli/search")
+@login_required
+def api_pembeli_search():
+    """
+    Cari pembeli toko user untuk kasir.
+    Query: q (min 2 huruf), limit (default 20, maks 50)
+    Urutan: prefix no HP, prefix nama, lalu nama mengandung q; di dalam tiap
+    tingkat urut nama (lalu id), stabil antar panggilan.
     Return JSON: [{id, nama, no_hp}, ...]
     """
+    toko_id = get_current_user()["toko"]["id"]
+    q = (request.args.get("q") or "").strip()
+    limit = _page_limit(default=20, maximum=50)
+    if len(q) < 2:
+        return jsonify([])
+
+    prefix = _like_pattern(q)[1:]          # 'q%'
     conn = get_db()
     cur = conn.cursor()
     cur.execute("""
-        SELECT id, nama, COALESCE(no_hp,'')
-        FROM pembeli
-        ORDER BY nama
-    """)
+        (SELECT id, nama, no_hp, 1 AS urut
+         FROM pembeli
+         WHERE (toko_id = %(toko)s OR toko_id IS NULL) AND no_hp LIKE %(prefix)s
+         ORDER BY no_hp, id LIMIT %(limit)s)
+        UNION ALL
+        (SELECT id, nama, no_hp, 2
+         FROM pembeli
+         WHERE (toko_id = %(toko)s OR toko_id IS NULL) AND lower(nama) LIKE lower(%(prefix)s)
+         ORDER BY lower(nama), id LIMIT %(limit)s)
+        UNION ALL
+        (SELECT id, nama, no_hp, 3
+         FROM pembeli
+         WHERE (toko_id = %(toko)s OR toko_id IS NULL)
+           AND length(%(q)s) >= 3 AND lower(nama) LIKE lower(%(sub)s)
+         ORDER BY lower(nama), id LIMIT %(limit)s)
+        ORDER BY urut, lower(nama), id
+    """, {"toko": toko_id, "q": q, "prefix": prefix, "sub": _like_pattern(q), "limit": limit})
     rows = cur.fetchall()
     cur.close()
 
-    return jsonify([
-        {"id": r[0], "nama": r[1], "no_hp": r[2]}
-        for r in rows
-    ])
+    hasil, seen = [], set()
+    for pid, nama, no_hp, _ in rows:
+        if pid in seen:
+            continue
+        seen.add(pid)
+        hasil.append({"id": pid, "nama": nama, "no_hp": no_hp or ""})
+        if len(hasil) >= limit:
+            break
+    return jsonify(hasil)
 
 
 @app.route("/api/sync-pembeli", methods=["POST"])
 def sync_pembeli():
     """
-    Simpan pembeli baru dari frontend offline.
+    Simpan pembeli baru dari frontend offline, milik toko user yang login.
+    no_hp yang sudah terdaftar di toko lain menjadi pembeli bersama (toko_id NULL).
     JSON: { "nama": "...", "no_hp": "...", "alamat": "..." }
     """
     data = request.get_json() or {}
+    user = get_current_user()
+    toko_id = user["toko"]["id"] if user else None
     conn = get_db()
     cur = conn.cursor()
     try:
         cur.execute("""
-            INSERT INTO pembeli (nama, no_hp, alamat)
-            VALUES (%s, %s, %s)
+            INSERT INTO pembeli (nama, no_hp, alamat, toko_id, updated_at)
+            VALUES (%s, %s, %s, %s, now())
             ON CONFLICT (no_hp) DO UPDATE
             SET nama = EXCLUDED.nama,
-                alamat = EXCLUDED.alamat
+                alamat = EXCLUDED.alamat,
+                toko_id = CASE WHEN pembeli.toko_id = EXCLUDED.toko_id
+                               THEN pembeli.toko_id END,
+                updated_at = now()
             RETURNING id
-        """, (data.get("nama"), data.get("no_hp"), data.get("alamat")))
+        """, (data.get("nama"), data.get("no_hp"), data.get("alamat"), toko_id))
         new_id = cur.fetchone()[0]
         conn.commit()
         return jsonify({"status": "ok", "id": new_id})
@@ -717,67 +2518,379 @@ def sync_transaksi():
     }
     """
     data = request.get_json() or {}
+    error = _validasi_tx(data) if isinstance(data, dict) else "body harus object"
+    if error:
+        return jsonify({"status": "error", "msg": error}), 400
+    items = data.get("items", [])
     conn = get_db()
     cur = conn.cursor()
     try:
-        # Cek apakah transaksi sudah ada (idempotent)
-        cur.execute("SELECT id FROM penjualan WHERE client_tx_id=%s",
-                    (data["client_tx_id"],))
-        if cur.fetchone():
+        # Kunci + header + detail dalam satu statement. Idempotent lewat
+        # penjualan_client_tx (migrations/009; penjualan yang berpartisi tidak
+        # bisa punya unique index client_tx_id saja): kiriman ganda — termasuk
+        # yang datang bersamaan dari dua kasir — menunggu yang pertama commit
+        # lalu kena ON CONFLICT, tidak mengembalikan baris, dan header/detail
+        # tidak ikut masuk.
+        with named_query("sync_transaksi.insert"):
+            cur.execute("""
+                WITH k AS (
+                    INSERT INTO penjualan_client_tx (client_tx_id, penjualan_id, tanggal)
+                    VALUES (%s, nextval(pg_get_serial_sequence('penjualan', 'id')),
+                            COALESCE(%s::timestamptz, now()))
+                    ON CONFLICT (client_tx_id) DO NOTHING
+                    RETURNING client_tx_id, penjualan_id, tanggal
+                ), h AS (
+                    INSERT INTO penjualan
+                    (id, client_tx_id, tanggal, pembeli_id,
+                     metode_bayar, bayar, kembalian, toko_id)
+                    SELECT penjualan_id, client_tx_id, tanggal,
+                           %s::int, %s, %s::numeric, %s::numeric, %s::int
+                    FROM k
+                    RETURNING id, toko_id, tanggal, DATE(tanggal) AS tgl
+                ), d AS (
+                    INSERT INTO penjualan_detail
+                    (penjualan_id, tanggal, barcode, nama, qty,
+                     harga_jual, harga_beli, potongan)
+                    SELECT h.id, h.tanggal, i.barcode, i.nama, i.qty,
+                           i.harga_jual, i.harga_beli, COALESCE(i.potongan, 0)
+                    FROM h
+                    CROSS JOIN ROWS FROM (
+                        jsonb_to_recordset(%s::jsonb)
+                        AS (barcode text, nama text, qty numeric,
+                            harga_jual numeric, harga_beli numeric, potongan numeric)
+                    ) WITH ORDINALITY AS i(barcode, nama, qty, harga_jual, harga_beli, potongan, urut)
+                    ORDER BY i.urut
+                )
+                SELECT id, toko_id, tanggal, tgl FROM h
+            """, (
+                data["client_tx_id"],
+                data.get("tanggal_client") or None,
+                data.get("pembeli"),
+                data.get("metode_bayar"),
+                data.get("bayar"),
+                data.get("kembalian"),
+                data.get("toko_id"),  # ✅ wajib isi toko_id
+                json.dumps([{
+                    "barcode": item["barcode"],
+                    "nama": item["nama"],
+                    "qty": item["qty"],
+                    "harga_jual": item["harga_jual"],
+                    "harga_beli": item["harga_beli"],
+                    "potongan": item.get("potongan", 0),
+                } for item in items]),
+            ))
+        row = cur.fetchone()
+        if row is None:
+            conn.rollback()
             return jsonify({"status": "duplicate", "msg": "Transaksi sudah ada"})
+        penjualan_id, toko_id, tanggal, tgl = row
 
-        # Insert header penjualan
-        cur.execute("""
+        upsert_katalog(cur, [(item, tanggal, toko_id) for item in items])
+        refresh_rekap(cur, toko_id, [tgl])
+        notify_penjualan(cur, toko_id, [(penjualan_id, tgl)])
+
+        conn.commit()
+        report_cache.invalidate(toko_id, [tgl])
+        return jsonify({"status": "ok", "id": penjualan_id})
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"status": "error", "msg": str(e)}), 500
+    finally:
+        cur.close()
+
+
+SYNC_BATCH_MAX = 500
+
+def _angka(v, wajib=False):
+    """Nilai untuk kolom numeric: angka JSON atau string angka (None kalau tidak wajib)."""
+    if v is None:
+        return not wajib
+    if isinstance(v, bool):
+        return False
+    if isinstance(v, (int, float)):
+        return True
+    if isinstance(v, str):
+        try:
+            Decimal(v)
+            return True
+        except ArithmeticError:
+            return False
+    return False
+
+def _validasi_tx(t):
+    """
+    Pesan error kalau bentuk/tipe transaksi tidak bisa disimpan, else None.
+    client_tx_id yang valid ditulis ulang ke bentuk kanonik (huruf kecil,
+    bertanda hubung) — bentuk yang dikembalikan Postgres — supaya bisa
+    dipakai langsung sebagai kunci pencocokan hasil INSERT.
+    """
+    try:
+        t["client_tx_id"] = str(uuid.UUID(str(t.get("client_tx_id")).strip()))
+    except ValueError:
+        return "client_tx_id bukan UUID"
+    tgl = t.get("tanggal_client")
+    if tgl not in (None, ""):
+        try:
+            datetime.fromisoformat(str(tgl))
+        except ValueError:
+            return "tanggal_client tidak valid"
+    for key in ("pembeli", "toko_id"):
+        v = t.get(key)
+        if v is not None and (isinstance(v, bool) or not isinstance(v, int)):
+            return f"{key} harus bilangan bulat"
+    if t.get("toko_id") is None:
+        return "toko_id wajib diisi"
+    if not isinstance(t.get("metode_bayar") or "", str):
+        return "metode_bayar harus teks"
+    for key in ("bayar", "kembalian"):
+        if not _angka(t.get(key)):
+            return f"{key} harus angka"
+    items = t.get("items", [])
+    if not isinstance(items, list):
+        return "items harus berupa list"
+    for n, item in enumerate(items, 1):
+        if not isinstance(item, dict):
+            return f"item {n} harus object"
+        if not item.get("barcode") or not isinstance(item["barcode"], str):
+            return f"item {n}: barcode wajib diisi"
+        if not isinstance(item.get("nama"), str):
+            return f"item {n}: nama wajib diisi"
+        for key in ("qty", "harga_jual", "harga_beli"):
+            if not _angka(item.get(key), wajib=True):
+                return f"item {n}: {key} harus angka"
+        if not _angka(item.get("potongan")):
+            return f"item {n}: potongan harus angka"
+    return None
+
+def _sync_batch_insert(cur, txs):
+    """
+    Kunci + header (satu statement multi-row), detail (satu INSERT multi-row)
+    dan katalog untuk transaksi `txs` {client_tx_id kanonik: tx}. Return baris
+    (id, client_tx_id, toko_id, tanggal, tgl) yang benar-benar baru.
+    """
+    with named_query("sync_batch.insert_header"):
+        inserted = execute_values(cur, """
+            WITH v (client_tx_id, tanggal, pembeli_id,
+                    metode_bayar, bayar, kembalian, toko_id) AS (
+                VALUES %s
+            ), k AS (
+                INSERT INTO penjualan_client_tx (client_tx_id, penjualan_id, tanggal)
+                SELECT client_tx_id, nextval(pg_get_serial_sequence('penjualan', 'id')), tanggal
+                FROM v
+                ON CONFLICT (client_tx_id) DO NOTHING
+                RETURNING client_tx_id, penjualan_id, tanggal
+            )
             INSERT INTO penjualan
-            (client_tx_id, tanggal, pembeli_id,
+            (id, client_tx_id, tanggal, pembeli_id,
              metode_bayar, bayar, kembalian, toko_id)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
-        """, (
-            data["client_tx_id"],
-            data.get("tanggal_client"),
-            data.get("pembeli"),
-            data.get("metode_bayar"),
-            data.get("bayar"),
-            data.get("kembalian"),
-            data.get("toko_id")  # ✅ wajib isi toko_id
-        ))
-        penjualan_id = cur.fetchone()[0]
-
-        # Insert detail barang
-        for item in data.get("items", []):
-            cur.execute("""
+            SELECT k.penjualan_id, k.client_tx_id, k.tanggal, v.pembeli_id,
+                   v.metode_bayar, v.bayar, v.kembalian, v.toko_id
+            FROM k JOIN v USING (client_tx_id)
+            RETURNING id, client_tx_id, toko_id, tanggal, DATE(tanggal)
+        """, [(
+            tx_id,
+            t.get("tanggal_client") or None,
+            t.get("pembeli"),
+            t.get("metode_bayar"),
+            t.get("bayar"),
+            t.get("kembalian"),
+            t.get("toko_id"),
+        ) for tx_id, t in txs.items()],
+            template="(%s::uuid, COALESCE(%s::timestamptz, now()), %s::int, %s, "
+                     "%s::numeric, %s::numeric, %s::int)",
+            page_size=len(txs), fetch=True)
+    new_ids = {str(tx_id): pid for pid, tx_id, _, _, _ in inserted}
+    tanggal_tx = {str(tx_id): tanggal for _, tx_id, _, tanggal, _ in inserted}
+
+    detail_rows = [(
+        new_ids[tx_id],
+        tanggal_tx[tx_id],
+        item["barcode"],
+        item["nama"],
+        item["qty"],
+        item["harga_jual"],
+        item["harga_beli"],
+        item.get("potongan") or 0
+    ) for tx_id, t in txs.items() if tx_id in new_ids
+      for item in t.get("items", [])]
+    if detail_rows:
+        with named_query("sync_batch.insert_detail"):
+            execute_values(cur, """
                 INSERT INTO penjualan_detail
-                (penjualan_id, barcode, nama, qty,
+                (penjualan_id, tanggal, barcode, nama, qty,
                  harga_jual, harga_beli, potongan)
-                VALUES (%s,%s,%s,%s,%s,%s,%s)
-            """, (
-                penjualan_id,
-                item["barcode"],
-                item["nama"],
-                item["qty"],
-                item["harga_jual"],
-                item["harga_beli"],
-                item.get("potongan", 0)
-            ))
+                VALUES %s
+            """, detail_rows, page_size=1000)
+
+    upsert_katalog(cur, [(item, tanggal_tx[tx_id], t["toko_id"])
+                         for tx_id, t in txs.items() if tx_id in new_ids
+                         for item in t.get("items", [])])
+    return inserted
+
+@app.route("/api/sync-transaksi/batch", methods=["POST"])
+def sync_transaksi_batch():
+    """
+    Simpan banyak transaksi offline sekaligus (antrian kasir setelah offline).
+    JSON: { "transaksi": [ {format sama dengan /api/sync-transaksi}, ... ] }
+    Return JSON:
+    {
+      "status": "ok",
+      "results": [{"client_tx_id": "...", "status": "ok|duplicate|error", "id": 1}, ...]
+    }
+    client_tx_id di results dalam bentuk kanonik UUID (huruf kecil, bertanda hubung).
+    Transaksi yang bentuknya salah langsung "error" tanpa menyentuh DB. Sisanya
+    disimpan sekaligus (_sync_batch_insert); kalau DB menolak, diulang satu per
+    satu dengan SAVEPOINT supaya satu transaksi rusak tidak menahan antrian
+    kasir — hanya transaksi itu yang "error", sisanya tetap commit.
+    """
+    data = request.get_json() or {}
+    txs = data.get("transaksi") if isinstance(data, dict) else data
+    if not isinstance(txs, list):
+        return jsonify({"status": "error", "msg": "transaksi harus berupa list"}), 400
+    if len(txs) > SYNC_BATCH_MAX:
+        return jsonify({"status": "error", "msg": f"maksimal {SYNC_BATCH_MAX} transaksi per batch"}), 413
+
+    results = {}
+    valid = {}
+    for t in txs:
+        if not isinstance(t, dict):
+            continue   # tanpa client_tx_id tidak bisa dilaporkan ke klien
+        mentah = str(t.get("client_tx_id") or "").strip()
+        if not mentah:
+            continue
+        error = _validasi_tx(t)   # sekaligus mengkanonikkan client_tx_id
+        if error:
+            results[mentah.lower()] = {"client_tx_id": mentah.lower(), "status": "error", "msg": error}
+            continue
+        valid.setdefault(t["client_tx_id"], t)   # client_tx_id ganda dalam satu batch cukup sekali
+
+    if not valid:
+        return jsonify({"status": "ok", "results": list(results.values())})
+
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute("SAVEPOINT sync_batch")
+        try:
+            inserted = _sync_batch_insert(cur, valid)
+        except psycopg2.Error:
+            cur.execute("ROLLBACK TO SAVEPOINT sync_batch")
+            inserted = []
+            for tx_id, t in list(valid.items()):
+                cur.execute("SAVEPOINT sync_tx")
+                try:
+                    inserted += _sync_batch_insert(cur, {tx_id: t})
+                    cur.execute("RELEASE SAVEPOINT sync_tx")
+                except psycopg2.Error as e:
+                    cur.execute("ROLLBACK TO SAVEPOINT sync_tx")
+                    del valid[tx_id]
+                    msg = (e.pgerror or str(e)).strip().splitlines()[0]
+                    results[tx_id] = {"client_tx_id": tx_id, "status": "error", "msg": msg}
+        new_ids = {str(tx_id): pid for pid, tx_id, _, _, _ in inserted}
+
+        touched, baru = {}, {}
+        for pid, _, toko_id, _, tgl in inserted:
+            touched.setdefault(toko_id, set()).add(tgl)
+            baru.setdefault(toko_id, []).append((pid, tgl))
+        for toko_id, days in touched.items():
+            refresh_rekap(cur, toko_id, days)
+            notify_penjualan(cur, toko_id, baru[toko_id])
 
         conn.commit()
-        return jsonify({"status": "ok", "id": penjualan_id})
+        for toko_id, days in touched.items():
+            report_cache.invalidate(toko_id, days)
     except Exception as e:
         conn.rollback()
         return jsonify({"status": "error", "msg": str(e)}), 500
     finally:
         cur.close()
 
+    for tx_id in valid:
+        if tx_id in new_ids:
+            results[tx_id] = {"client_tx_id": tx_id, "status": "ok", "id": new_ids[tx_id]}
+        else:
+            results[tx_id] = {"client_tx_id": tx_id, "status": "duplicate", "msg": "Transaksi sudah ada"}
+    return jsonify({"status": "ok", "results": list(results.values())})
+
+
+@app.route("/api/pool-stats")
+def api_pool_stats():
+    """Counter connection pool (monitoring); + pool & routing replica kalau aktif, stream penjualan."""
+    st = get_pool().stats()
+    if get_replica_pool() is not None:
+        st["replica"] = {**get_replica_pool().stats(), **replica_state.stats()}
+    st["penjualan_stream"] = penjualan_feed.stats()
+    return jsonify(st)
+
+@app.route("/metrics")
+def metrics():
+    """
+    Metrik format teks Prometheus (per proses): latensi route & query bernama,
+    gauge pool koneksi (primary & replica), routing baca, stream penjualan,
+    hit/miss report_cache.
+    """
+    lines = http_latency.render() + db_latency.render()
+
+    pools = {"primary": get_pool().stats()}
+    if get_replica_pool() is not None:
+        pools["replica"] = get_replica_pool().stats()
+    for key, kind, help_text in (
+        ("size", "gauge", "Koneksi terbuka"),
+        ("in_use", "gauge", "Koneksi sedang dipinjam"),
+        ("idle", "gauge", "Koneksi idle"),
+        ("maxconn", "gauge", "Batas koneksi pool"),
+        ("checkouts", "counter", "Total peminjaman koneksi"),
+        ("exhausted", "counter", "Peminjaman yang harus menunggu karena pool habis"),
+        ("timeouts", "counter", "Peminjaman yang gagal (PoolTimeout)"),
+        ("recycled", "counter", "Koneksi yang diganti baru"),
+        ("wait_seconds_total", "counter", "Total waktu tunggu koneksi"),
+    ):
+        name = f"kelontong_db_pool_{key}" + ("_total" if kind == "counter" and not key.endswith("_total") else "")
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        lines += [f'{name}{{pool="{p}"}} {st[key]}' for p, st in pools.items()]
+
+    if "replica" in pools:
+        rs = replica_state.stats()
+        name = "kelontong_db_read_routed_total"
+        lines += [f"# HELP {name} Keputusan get_read_pool (replica / primary + alasannya)",
+                  f"# TYPE {name} counter"]
+        lines += [f'{name}{{target="{k}"}} {v}' for k, v in sorted(rs["routed"].items())]
+        name = "kelontong_db_replica_lag_seconds"
+        lines += [f"# HELP {name} Lag replica terakhir yang dicek (-1 = tidak bisa dipakai)",
+                  f"# TYPE {name} gauge",
+                  f"{name} {rs['lag_seconds'] if rs['lag_seconds'] is not None else -1}"]
+
+    fs = penjualan_feed.stats()
+    lines += ["# HELP kelontong_penjualan_stream_subscribers Stream SSE penjualan yang terbuka",
+              "# TYPE kelontong_penjualan_stream_subscribers gauge",
+              f"kelontong_penjualan_stream_subscribers {fs['subscribers']}"]
+    for key, help_text in (("notifications", "NOTIFY penjualan_baru yang diterima"),
+                           ("rejected", "Stream ditolak karena PENJUALAN_STREAM_MAX penuh"),
+                           ("resync", "Stream yang harus resync (queue penuh / LISTEN putus)")):
+        name = f"kelontong_penjualan_stream_{key}_total"
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter", f"{name} {fs[key]}"]
+
+    cache = report_cache.stats()["queries"]
+    for kind in ("hit", "miss", "error"):
+        name = f"kelontong_report_cache_{kind}_total"
+        lines += [f"# HELP {name} report_cache {kind} per query", f"# TYPE {name} counter"]
+        lines += [f'{name}{{query="{_metric_label(q)}"}} {v[kind]}' for q, v in sorted(cache.items())]
+
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+@app.route("/api/cache-stats")
+def api_cache_stats():
+    """Hit/miss report_cache per query (monitoring, per proses)."""
+    return jsonify(report_cache.stats())
+
 
 @app.route("/api/send-wa", methods=["POST"])
 def api_send_wa():
     """
-    Proxy untuk kirim WhatsApp via service eksternal.
+    Antrikan pesan WhatsApp ke outbox; dikirim oleh WaWorker di background.
     Body JSON: { "number": "62xxxxxxxxxx", "message": "..." }
+    Return JSON (202): { "status": "queued", "id": 123 }
     """
-    import requests
-
     payload = request.get_json() or {}
     number = (payload.get("number") or "").strip()
     message = (payload.get("message") or "").strip()
@@ -788,31 +2901,506 @@ def api_send_wa():
     if not number.startswith("62") or not number.isdigit():
         return jsonify({"status": "error", "msg": "format nomor harus 62..."}), 400
 
+    conn = get_db()
+    cur = conn.cursor()
     try:
-        r = requests.post(
-            "https://blast.sukipli.work/send-message",
-            json={"number": number, "message": message},
-            timeout=10,
-        )
-        # teruskan response dari server WA
-        try:
-            return jsonify(r.json()), r.status_code
-        except ValueError:
-            return r.text, r.status_code, {
-                "Content-Type": r.headers.get("Content-Type", "text/plain")
-            }
+        cur.execute("""
+            INSERT INTO wa_outbox (number, message)
+            VALUES (%s, %s)
+            RETURNING id
+        """, (number, message))
+        msg_id = cur.fetchone()[0]
+        conn.commit()
+        return jsonify({"status": "queued", "id": msg_id}), 202
     except Exception as e:
-        return jsonify({"status": "error", "msg": f"gagal kirim WA: {e}"}), 502
+        conn.rollback()
+        return jsonify({"status": "error", "msg": f"gagal antri WA: {e}"}), 500
+    finally:
+        cur.close()
+
+@app.route("/api/send-wa/<int:msg_id>")
+def api_send_wa_status(msg_id):
+    """
+    Status pesan WA di outbox.
+    Return JSON: {id, status: pending|sending|sent|failed, attempts, last_error, ...}
+    """
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT id, status, attempts, last_error, created_at, sent_at
+        FROM wa_outbox
+        WHERE id = %s
+    """, (msg_id,))
+    row = cur.fetchone()
+    cur.close()
+    if not row:
+        return jsonify({"status": "error", "msg": "not found"}), 404
+    return jsonify({
+        "id": row[0],
+        "status": row[1],
+        "attempts": row[2],
+        "last_error": row[3],
+        "created_at": row[4].isoformat(),
+        "sent_at": row[5].isoformat() if row[5] else None,
+    })
 
 # ==========================================
-# 9. Main Entry
+# 9. WhatsApp Outbox Worker
 # =========================================
 
-if __name__ == "__main__":
-    import os
+WA_GATEWAY_URL = os.getenv("WA_GATEWAY_URL", "https://blast.sukipli.work/send-message")
 
+class WaWorker:
+    """
+    Kirim pesan dari tabel wa_outbox ke gateway WA.
+
+    - Klaim batch dengan FOR UPDATE SKIP LOCKED, jadi beberapa worker
+      (thread / proses) aman jalan bersamaan.
+    - Kirim paralel maks `concurrency` pesan lewat satu requests.Session
+      (koneksi HTTP dipakai ulang).
+    - Gagal sementara (timeout, 5xx, 429) dijadwalkan ulang dengan backoff
+      eksponensial; 4xx lain atau setelah `max_attempts` → failed.
+    - Pesan yang macet di status 'sending' (worker mati) diambil lagi setelah
+      `lease` detik.
+    """
+
+    def __init__(self, pool, gateway_url=WA_GATEWAY_URL, concurrency=4, max_attempts=5,
+                 backoff_base=5.0, backoff_max=3600.0, timeout=10.0, lease=300.0):
+        self.pool = pool
+        self.gateway_url = gateway_url
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.lease = lease
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="wa-send")
+
+    def claim(self, limit):
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                UPDATE wa_outbox
+                SET status = 'sending',
+                    attempts = attempts + 1,
+                    next_attempt_at = now() + %s * interval '1 second',
+                    updated_at = now()
+                WHERE id IN (
+                    SELECT id FROM wa_outbox
+                    WHERE status IN ('pending', 'sending')
+                      AND next_attempt_at <= now()
+                    ORDER BY next_attempt_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, number, message, attempts
+            """, (self.lease, limit))
+            rows = cur.fetchall()
+            cur.close()
+            conn.commit()
+            return rows
+
+    def send(self, msg_id, number, message, attempts):
+        """Kirim satu pesan dan catat hasilnya. Return status akhir."""
+        retry = True
+        try:
+            r = self.session.post(
+                self.gateway_url,
+                json={"number": number, "message": message},
+                timeout=self.timeout,
+            )
+            if r.ok:
+                return self._mark(msg_id, "sent", response=r.text[:2000])
+            error = f"HTTP {r.status_code}: {r.text[:500]}"
+            retry = r.status_code >= 500 or r.status_code == 429
+        except requests.RequestException as e:
+            error = f"{type(e).__name__}: {e}"
+
+        if retry and attempts < self.max_attempts:
+            delay = min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+            return self._mark(msg_id, "pending", error=error, delay=delay)
+        return self._mark(msg_id, "failed", error=error)
+
+    def _mark(self, msg_id, status, error=None, response=None, delay=0):
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                UPDATE wa_outbox
+                SET status = %s,
+                    last_error = %s,
+                    response = COALESCE(%s, response),
+                    next_attempt_at = now() + %s * interval '1 second',
+                    sent_at = CASE WHEN %s = 'sent' THEN now() END,
+                    updated_at = now()
+                WHERE id = %s
+            """, (status, error, response, delay, status, msg_id))
+            cur.close()
+            conn.commit()
+        return status
+
+    def run_once(self):
+        """Proses satu batch. Return jumlah pesan yang dicoba."""
+        rows = self.claim(self.concurrency * 2)
+        for fut in [self.executor.submit(self.send, *row) for row in rows]:
+            fut.result()
+        return len(rows)
+
+    def run_forever(self, stop_event=None, poll_interval=2.0):
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            try:
+                if self.run_once():
+                    continue   # masih ada antrian, langsung ambil batch berikutnya
+            except Exception:
+                app.logger.exception("WA worker error")
+            stop_event.wait(poll_interval)
+
+def wa_worker_from_env():
+    return WaWorker(
+        get_pool(),
+        gateway_url=WA_GATEWAY_URL,
+        concurrency=int(os.getenv("WA_CONCURRENCY", 4)),
+        max_attempts=int(os.getenv("WA_MAX_ATTEMPTS", 5)),
+        backoff_base=float(os.getenv("WA_BACKOFF_BASE", 5)),
+        timeout=float(os.getenv("WA_TIMEOUT", 10)),
+    )
+
+def start_wa_worker_thread():
+    """Jalankan WaWorker sebagai daemon thread di proses web (WA_WORKER_INPROCESS=1)."""
+    t = threading.Thread(target=wa_worker_from_env().run_forever, name="wa-worker", daemon=True)
+    t.start()
+    return t
+
+# ==========================================
+# 10. CLI (flask --app app <command>)
+# =========================================
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+@app.cli.command("migrate")
+def migrate_command():
+    """Jalankan file migrations/*.sql yang belum pernah dijalankan (urut nama file)."""
+    conn = get_pool().getconn()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                nama TEXT PRIMARY KEY,
+                dijalankan TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        """)
+        cur.execute("SELECT nama FROM schema_migrations")
+        sudah = {r[0] for r in cur.fetchall()}
+        conn.commit()
+
+        for nama in sorted(os.listdir(MIGRATIONS_DIR)):
+            if not nama.endswith(".sql") or nama in sudah:
+                continue
+            with open(os.path.join(MIGRATIONS_DIR, nama), encoding="utf-8") as f:
+                cur.execute(f.read())
+            cur.execute("INSERT INTO schema_migrations (nama) VALUES (%s)", (nama,))
+            conn.commit()
+            print(f"✅ {nama}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        get_pool().putconn(conn)
+
+@app.cli.command("rekap-refresh")
+@click.option("--start", help="Tanggal awal (YYYY-MM-DD); kosong = semua histori")
+@click.option("--end", help="Tanggal akhir (YYYY-MM-DD)")
+@click.option("--toko", "toko_id", type=int, help="Hanya toko ini")
+def rekap_refresh_command(start, end, toko_id):
+    """Bangun ulang rollup rekap_harian(_barang) dari view sumber."""
+    conn = get_pool().getconn()
+    cur = conn.cursor()
+    try:
+        if start or end:
+            cur.execute("""
+                SELECT DISTINCT toko_id, tgl FROM v_laporan_ringkasan
+                WHERE tgl BETWEEN COALESCE(%s::date, '-infinity') AND COALESCE(%s::date, 'infinity')
+                  AND (%s::int IS NULL OR toko_id = %s)
+                UNION
+                SELECT DISTINCT toko_id, tgl FROM rekap_harian
+                WHERE tgl BETWEEN COALESCE(%s::date, '-infinity') AND COALESCE(%s::date, 'infinity')
+                  AND (%s::int IS NULL OR toko_id = %s)
+            """, (start, end, toko_id, toko_id) * 2)
+        else:
+            cur.execute("""
+                SELECT DISTINCT toko_id, tgl FROM v_laporan_ringkasan
+                WHERE (%s::int IS NULL OR toko_id = %s)
+                UNION
+                SELECT DISTINCT toko_id, tgl FROM rekap_harian
+                WHERE (%s::int IS NULL OR toko_id = %s)
+            """, (toko_id, toko_id) * 2)
+        rows = cur.fetchall()
+        # bulan yang partisinya sudah dilepas ke arsip tidak ada lagi di view;
+        # rollup-nya jangan ikut dihapus
+        cur.execute("SELECT bulan FROM penjualan_partisi_arsip WHERE dilepas IS NOT NULL")
+        dilepas = {b for (b,) in cur.fetchall()}
+        touched = {}
+        for t_id, tgl in rows:
+            if tgl.replace(day=1) not in dilepas:
+                touched.setdefault(t_id, set()).add(tgl)
+
+        for t_id, days in touched.items():
+            refresh_rekap(cur, t_id, days)
+            conn.commit()
+            report_cache.invalidate(t_id, days)
+            print(f"✅ toko {t_id}: {len(days)} hari")
+        if touched and isinstance(report_cache.backend, LocalCacheBackend):
+            print(f"ℹ️  cache laporan lokal per worker: hasil lama masih bisa tampil sampai "
+                  f"{report_cache.ttl_past:.0f} detik (set REPORT_CACHE_URL untuk invalidasi langsung)")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        get_pool().putconn(conn)
+
+def _bulan_partisi(cur):
+    """Bulan (tanggal 1) dari partisi penjualan_YYYYMM yang masih menempel."""
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'penjualan'::regclass
+          AND c.relname ~ '^penjualan_[0-9]{6}$'
+        ORDER BY c.relname
+    """)
+    return [datetime.strptime(nama[-6:], "%Y%m").date() for (nama,) in cur.fetchall()]
+
+@app.cli.command("partitions-maintain")
+@click.option("--ahead", type=int, default=3, show_default=True,
+              help="Jumlah bulan ke depan yang partisinya disiapkan")
+def partitions_maintain_command(ahead):
+    """
+    Siapkan partisi penjualan bulan ini s.d. `ahead` bulan ke depan, dan
+    bulan mana pun yang barisnya terlanjur jatuh ke partisi default.
+    Jalankan rutin (cron harian/mingguan) supaya partisi default tetap kosong.
+    """
+    conn = get_pool().getconn()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT bulan FROM penjualan_partisi_arsip WHERE dilepas IS NOT NULL")
+        dilepas = {b for (b,) in cur.fetchall()}
+        cur.execute("""
+            SELECT DISTINCT date_trunc('month', tanggal)::date FROM penjualan_default
+            UNION
+            SELECT (date_trunc('month', now()) + make_interval(months => n))::date
+            FROM generate_series(0, %s) AS n
+            ORDER BY 1
+        """, (ahead,))
+        for (bulan,) in cur.fetchall():
+            if bulan in dilepas:
+                print(f"⚠️  {bulan:%Y-%m}: ada baris di penjualan_default tapi bulan ini sudah diarsip")
+                continue
+            cur.execute("SELECT penjualan_buat_partisi(%s)", (bulan,))
+            if cur.fetchone()[0]:
+                print(f"✅ partisi {bulan:%Y-%m} dibuat")
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        get_pool().putconn(conn)
+
+@app.cli.command("partitions-archive")
+@click.option("--detach-older-than", "detach_months", type=int,
+              help="Lepas partisi yang lebih tua dari N bulan ke schema arsip")
+def partitions_archive_command(detach_months):
+    """
+    Bekukan partisi bulan yang sudah tutup (VACUUM FREEZE + ANALYZE, sekali per
+    bulan): autovacuum selanjutnya melewati halaman yang sudah frozen, jadi
+    biaya vacuum & wraparound tidak ikut tumbuh dengan histori.
+
+    Dengan --detach-older-than, partisi lama dilepas dari penjualan dan
+    dipindah ke schema arsip: tidak lagi muncul di daftar transaksi/export,
+    tapi rollup rekap_harian(_barang) untuk bulan itu tetap dipakai laporan.
+    """
+    bulan_ini = datetime.now().date().replace(day=1)
+    conn = get_pool().getconn()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT bulan, dibekukan FROM penjualan_partisi_arsip")
+        dibekukan = {b for b, t in cur.fetchall() if t is not None}
+        semua = _bulan_partisi(cur)
+        conn.commit()
+
+        # VACUUM tidak bisa di dalam blok transaksi
+        conn.autocommit = True
+        for bulan in semua:
+            if bulan >= bulan_ini or bulan in dibekukan:
+                continue
+            for tabel in ("penjualan", "penjualan_detail"):
+                cur.execute(f"VACUUM (FREEZE, ANALYZE) {tabel}_{bulan:%Y%m}")
+            cur.execute("""
+                INSERT INTO penjualan_partisi_arsip (bulan, dibekukan) VALUES (%s, now())
+                ON CONFLICT (bulan) DO UPDATE SET dibekukan = EXCLUDED.dibekukan
+            """, (bulan,))
+            print(f"✅ {bulan:%Y-%m} dibekukan")
+        conn.autocommit = False
+
+        if detach_months is None:
+            return
+        y, m = divmod(bulan_ini.year * 12 + bulan_ini.month - 1 - detach_months, 12)
+        batas = date(y, m + 1, 1)
+        for bulan in semua:
+            if bulan >= batas:
+                continue
+            sfx = f"{bulan:%Y%m}"
+            # detail dulu: FK hasil clone di tabel yang dilepas dibuang supaya
+            # header bulan yang sama juga bisa dilepas
+            cur.execute(f"ALTER TABLE penjualan_detail DETACH PARTITION penjualan_detail_{sfx}")
+            cur.execute(f"ALTER TABLE penjualan_detail_{sfx} "
+                        f"DROP CONSTRAINT IF EXISTS penjualan_detail_penjualan_fkey")
+            cur.execute(f"ALTER TABLE penjualan DETACH PARTITION penjualan_{sfx}")
+            cur.execute(f"ALTER TABLE penjualan_detail_{sfx} SET SCHEMA arsip")
+            cur.execute(f"ALTER TABLE penjualan_{sfx} SET SCHEMA arsip")
+            cur.execute("""
+                INSERT INTO penjualan_partisi_arsip (bulan, dilepas) VALUES (%s, now())
+                ON CONFLICT (bulan) DO UPDATE SET dilepas = EXCLUDED.dilepas
+            """, (bulan,))
+            conn.commit()
+            print(f"✅ {bulan:%Y-%m} dilepas ke arsip.penjualan_{sfx}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.autocommit = False
+        cur.close()
+        get_pool().putconn(conn)
+
+class _ExplainCursor(psycopg2.extensions.cursor):
+    """Cursor yang menjalankan EXPLAIN (FORMAT JSON) alih-alih query-nya."""
+
+    def execute(self, query, vars=None):
+        return super().execute("EXPLAIN (FORMAT JSON) " + query, vars)
+
+
+class _ExplainConn:
+    """Bungkus koneksi supaya query_*() yang asli menghasilkan plan, bukan data."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return self._conn.cursor(cursor_factory=_ExplainCursor)
+
+
+def _plan_indexes(plan, key="Index Name"):
+    """Kumpulkan semua "Index Name" (atau `key` lain) dari pohon plan EXPLAIN JSON."""
+    found = set()
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if key in node:
+            found.add(node[key])
+        stack.extend(node.get("Plans", []))
+    return found
+
+def _with_partition_indexes(conn, names):
+    """Index di tabel berpartisi (migrations/009) dipakai lewat index per partisinya."""
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = ANY(%s)
+    """, (list(names),))
+    found = set(names) | {r[0] for r in cur.fetchall()}
+    cur.close()
+    return found
+
+
+@app.cli.command("explain-check")
+@click.option("--toko", "toko_id", type=int, default=1)
+def explain_check_command(toko_id):
+    """
+    Buktikan query penjualan memakai index dari migrations/003, 007 dan 009, dan
+    rentang 30 hari hanya membaca partisi bulan terkait (exit 1 kalau tidak).
+    enable_seqscan dimatikan supaya tabel kecil di dev tetap menunjukkan index
+    yang *bisa* dipakai planner.
+    """
+    today = datetime.now().date()
+    checks = [
+        ("query_penjualan",
+         lambda c: query_penjualan(c, toko_id, today - timedelta(days=30), today),
+         {"penjualan_toko_tanggal_id_idx"}),
+        ("query_penjualan (halaman berikut)",
+         lambda c: query_penjualan(c, toko_id, today - timedelta(days=30), today,
+                                   PENJUALAN_PAGE_SIZE + 1, (datetime.now().isoformat(), 0)),
+         {"penjualan_toko_tanggal_id_idx"}),
+        ("query_detail_barang_hari_ini",
+         lambda c: query_detail_barang_hari_ini(c, toko_id, "0", 0),
+         {"penjualan_toko_tanggal_id_idx"}),
+        ("query_detail_barang_hari_ini (detail)",
+         lambda c: query_detail_barang_hari_ini(c, toko_id, "0", 0),
+         {"penjualan_detail_penjualan_id_idx", "penjualan_detail_barcode_harga_idx"}),
+    ]
+
+    conn = get_pool().getconn()
+    gagal = 0
+    try:
+        cur = conn.cursor()
+        cur.execute("SET LOCAL enable_seqscan = off")
+        cur.close()
+        for nama, run, expected in checks:
+            plan = run(_ExplainConn(conn))[0][0][0]["Plan"]
+            used = _plan_indexes(plan)
+            ok = bool(used & _with_partition_indexes(conn, expected))
+            gagal += not ok
+            print(f"{'✅' if ok else '❌'} {nama}: index dipakai {sorted(used) or '-'}")
+
+        # 30 hari menyentuh paling banyak 2 bulan; partisi lain & default harus
+        # terpangkas saat planning (detail dipangkas saat eksekusi lewat tanggal join)
+        plan = query_penjualan(_ExplainConn(conn), toko_id, today - timedelta(days=29), today)[0][0][0]["Plan"]
+        partisi = {r for r in _plan_indexes(plan, "Relation Name")
+                   if r == "penjualan_default" or (r.startswith("penjualan_") and r[10:].isdigit())}
+        ok = 0 < len(partisi) <= 2 and "penjualan_default" not in partisi
+        gagal += not ok
+        print(f"{'✅' if ok else '❌'} query_penjualan (pruning): partisi dibaca {sorted(partisi)}")
+    finally:
+        conn.rollback()
+        get_pool().putconn(conn)
+    if gagal:
+        raise SystemExit(1)
+
+@app.cli.command("wa-worker")
+@click.option("--once", is_flag=True, help="Proses satu batch lalu keluar")
+def wa_worker_command(once):
+    """Kirim antrian wa_outbox (WA_GATEWAY_URL, WA_CONCURRENCY, WA_MAX_ATTEMPTS, ...)."""
+    worker = wa_worker_from_env()
+    if once:
+        print(f"✅ {worker.run_once()} pesan diproses")
+    else:
+        worker.run_forever()
+
+# ==========================================
+# 11. Main Entry
+# =========================================
+
+# Server WSGI produksi: gunicorn -c gunicorn.conf.py app:app (preload_app).
+# `app` dibuat sekali saat import; pool DB dibuat malas per proses (get_pool),
+# jadi aman di-import di master lalu di-fork ke banyak worker. WA worker
+# dijalankan per worker dari gunicorn.conf.py (post_fork) atau sebagai proses
+# terpisah (`flask wa-worker`).
+
+if __name__ == "__main__":
     host = os.getenv("FLASK_HOST", "0.0.0.0")
     port = int(os.getenv("FLASK_PORT", 5000))
     debug = os.getenv("FLASK_DEBUG", "false").lower() in ("1", "true", "yes")
 
+    if os.getenv("WA_WORKER_INPROCESS", "false").lower() in ("1", "true", "yes"):
+        start_wa_worker_thread()
+
     app.run(host=host, port=port, debug=debug)
@@ -0,0 +1,167 @@
+"""
+Cek regresi API terhadap server yang sedang jalan (data dari bench/seed.py):
+setiap cek memanggil endpoint dengan input tepi dan memastikan statusnya
+bukan 500 dan bentuk respons sesuai.
+
+    python bench/api_check.py --base-url http://127.0.0.1:5000
+    python bench/api_check.py --only pembeli
+
+Exit 1 kalau ada cek yang gagal.
+"""
+import argparse
+import base64
+import json
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+import requests
+
+CHECKS = []
+
+
+def check(fn):
+    CHECKS.append(fn)
+    return fn
+
+
+def expect(r, status=200):
+    if r.status_code != status:
+        raise AssertionError(f"{r.request.method} {r.url} → HTTP {r.status_code} "
+                             f"(harus {status}): {r.text[:200]}")
+    return r.json() if "json" in r.headers.get("Content-Type", "") else r.text
+
+
+@check
+def pembeli_tanpa_since(s, base):
+    """Daftar lama (tanpa since) & muat pertama kasir (since kosong / rusak)."""
+    rows = expect(s.get(f"{base}/api/pembeli"))
+    assert isinstance(rows, list), f"tanpa since harus list, dapat {type(rows).__name__}"
+    for since in ("", "bukan-tanggal"):
+        js = expect(s.get(f"{base}/api/pembeli", params={"since": since}))
+        assert js["full"] is True, f"since={since!r} harus full"
+        assert len(js["rows"]) == len(rows), f"since={since!r}: {len(js['rows'])} ≠ {len(rows)} baris"
+    if js["version"]:
+        delta = expect(s.get(f"{base}/api/pembeli", params={"since": js["version"]}))
+        assert delta["full"] is False, "since=version harus delta"
+
+
+def _tx(**kw):
+    return {
+        "client_tx_id": str(uuid.uuid4()),
+        "tanggal_client": datetime.now().isoformat(timespec="seconds"),
+        "metode_bayar": "tunai", "bayar": 20000, "kembalian": 5000,
+        "pembeli": None, "toko_id": 1,
+        "items": [{"barcode": "8990000000001", "nama": "Gula Bench 1kg", "qty": 1,
+                   "harga_jual": 15000, "harga_beli": 12000, "potongan": 0}],
+        **kw,
+    }
+
+
+@check
+def sync_batch_satu_rusak(s, base):
+    """Transaksi rusak (bentuk salah / ditolak DB) hanya menggagalkan dirinya sendiri."""
+    baik = [_tx(), _tx()]
+    rusak = [
+        _tx(client_tx_id="bukan-uuid"),
+        _tx(items=[{"nama": "tanpa barcode", "qty": 1}]),
+        _tx(items=[{"barcode": "8990000000001", "nama": "Gula Bench 1kg", "qty": "1.5",
+                    "harga_jual": 15000, "harga_beli": 12000}]),   # lolos validasi, qty INT ditolak DB
+    ]
+    js = expect(s.post(f"{base}/api/sync-transaksi/batch",
+                       json={"transaksi": [rusak[0], baik[0], "bukan object", *rusak[1:], baik[1]]}))
+    status = {r["client_tx_id"]: r["status"] for r in js["results"]}
+    for t in baik:
+        assert status.get(t["client_tx_id"]) == "ok", f"{t['client_tx_id']}: {status.get(t['client_tx_id'])}"
+    for t in rusak:
+        tx_id = t["client_tx_id"].lower()
+        assert status.get(tx_id) == "error", f"{tx_id}: {status.get(tx_id)} (harus error)"
+
+
+@check
+def sync_batch_uuid_nonkanonik(s, base):
+    """client_tx_id tanpa tanda hubung / berkurung kurawal tetap tersimpan lengkap dengan detailnya."""
+    ids = [uuid.uuid4(), uuid.uuid4()]
+    txs = [_tx(client_tx_id=ids[0].hex.upper()), _tx(client_tx_id="{%s}" % ids[1])]
+    js = expect(s.post(f"{base}/api/sync-transaksi/batch", json={"transaksi": txs}))
+    status = {r["client_tx_id"]: r for r in js["results"]}
+    for u in ids:
+        r = status.get(str(u))
+        assert r and r["status"] == "ok", f"{u}: {r}"
+        nota = expect(s.get(f"{base}/api/penjualan/nota", params={"ids": r["id"]}))
+        assert nota["rows"] and nota["rows"][0]["items"], f"{u}: detail transaksi tidak tersimpan"
+
+
+@check
+def all_barang_delta_sync_terlambat(s, base):
+    """Barang dari sync offline bertanggal lama tetap muncul di delta berikutnya."""
+    versi = expect(s.get(f"{base}/api/all-barang", params={"since": ""}))["version"]
+    barcode = "899" + uuid.uuid4().hex[:10]
+    lama = (datetime.now() - timedelta(days=2)).isoformat(timespec="seconds")
+    js = expect(s.post(f"{base}/api/sync-transaksi", json=_tx(tanggal_client=lama, items=[{
+        "barcode": barcode, "nama": "Barang Cek Delta", "qty": 1,
+        "harga_jual": 1000, "harga_beli": 800, "potongan": 0}])))
+    assert js["status"] == "ok", js
+    delta = expect(s.get(f"{base}/api/all-barang", params={"since": versi},
+                         headers={"Cache-Control": "no-cache"}))
+    assert any(b["barcode"] == barcode for b in delta["rows"]), f"{barcode} tidak ada di delta since={versi}"
+
+
+def enc(v):
+    """Cursor buatan tangan, dengan encoding yang sama dengan _encode_cursor()."""
+    return base64.urlsafe_b64encode(json.dumps(v).encode()).decode().rstrip("=")
+
+
+@check
+def laporan_cursor_rusak(s, base):
+    """Cursor laporan yang bukan base64 JSON / bentuknya salah → 400, bukan 500."""
+    for path in ("/api/laporan/harian", "/api/laporan/per-barang"):
+        for cursor in ("!!!", enc({"tgl": "2024-01-01"}), enc([["x"]]), enc(5), enc(None)):
+            js = expect(s.get(f"{base}{path}", params={"cursor": cursor}), status=400)
+            assert js["status"] == "error", js
+    expect(s.get(f"{base}/api/laporan/harian", params={"cursor": enc("bukan-tanggal")}), status=400)
+    expect(s.get(f"{base}/api/laporan/harian", params={"cursor": enc("2024-01-01")}))
+    expect(s.get(f"{base}/api/laporan/per-barang", params={"cursor": enc("899")}))
+
+
+@check
+def penjualan_cursor_rusak(s, base):
+    """Cursor (tanggal, id) yang rusak / tipenya salah → 400, bukan halaman 1 atau 500."""
+    for path in ("/api/penjualan", "/api/penjualan/nota"):
+        for cursor in ("!!!", enc(["x", 1]), enc([1, 2]), enc(["2024-01-01T00:00:00", "1"]),
+                       enc({"tanggal": "2024-01-01"})):
+            js = expect(s.get(f"{base}{path}", params={"cursor": cursor}), status=400)
+            assert js["status"] == "error", js
+        expect(s.get(f"{base}{path}", params={"cursor": enc(["2024-01-01T00:00:00+07:00", 1])}))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--base-url", default="http://127.0.0.1:5000")
+    ap.add_argument("--username", default="bench1")
+    ap.add_argument("--password", default="bench")
+    ap.add_argument("--only", default="", help="Hanya cek yang namanya memuat teks ini")
+    args = ap.parse_args()
+    base = args.base_url.rstrip("/")
+
+    s = requests.Session()
+    r = s.post(f"{base}/login", allow_redirects=False,
+               data={"username": args.username, "password": args.password})
+    if r.status_code != 302 or "/login" in r.headers.get("Location", ""):
+        sys.exit(f"Login {args.username} gagal (HTTP {r.status_code})")
+
+    gagal = 0
+    for fn in CHECKS:
+        if args.only not in fn.__name__:
+            continue
+        try:
+            fn(s, base)
+            print(f"✅ {fn.__name__}")
+        except (AssertionError, requests.RequestException, KeyError, ValueError) as e:
+            gagal += 1
+            print(f"❌ {fn.__name__}: {e}")
+    sys.exit(1 if gagal else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Uji konkurensi idempotensi /api/sync-transaksi: kirim transaksi yang SAMA
+(client_tx_id sama) berkali-kali secara paralel, lalu pastikan tepat satu
+yang "ok", sisanya "duplicate", dan detailnya hanya masuk sekali.
+
+    python bench/dup_sync.py --base-url http://127.0.0.1:5000 --parallel 16 --rounds 20
+    python bench/dup_sync.py --dsn "dbname=kelontong_bench user=postgres"   # + cek isi tabel
+
+Exit code 1 kalau ada ronde yang gagal.
+"""
+import argparse
+import os
+import sys
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+ITEMS = [
+    {"barcode": "8990000000001", "nama": "Gula Bench 1kg", "qty": 2,
+     "harga_jual": 15000, "harga_beli": 12000, "potongan": 0},
+    {"barcode": "8990000000002", "nama": "Kopi Bench sachet", "qty": 5,
+     "harga_jual": 2000, "harga_beli": 1500, "potongan": 500},
+]
+
+
+def one_round(base_url, toko_id, parallel, dsn):
+    tx = {
+        "client_tx_id": str(uuid.uuid4()),
+        "tanggal_client": datetime.now().isoformat(timespec="seconds"),
+        "pembeli": None,
+        "metode_bayar": "tunai",
+        "bayar": 50000,
+        "kembalian": 10500,
+        "toko_id": toko_id,
+        "items": ITEMS,
+    }
+    barrier = threading.Barrier(parallel)
+
+    def kirim(_):
+        s = requests.Session()
+        barrier.wait()          # lepas semua request sedekat mungkin bersamaan
+        r = s.post(f"{base_url}/api/sync-transaksi", json=tx, timeout=30)
+        return r.status_code, r.json()
+
+    with ThreadPoolExecutor(max_workers=parallel) as ex:
+        hasil = list(ex.map(kirim, range(parallel)))
+
+    status = [js.get("status") for _, js in hasil]
+    masalah = []
+    if status.count("ok") != 1:
+        masalah.append(f"ok={status.count('ok')} (harus 1)")
+    lain = [s for s in status if s not in ("ok", "duplicate")]
+    if lain:
+        masalah.append(f"status tak terduga: {[js for _, js in hasil if js.get('status') in lain][:3]}")
+
+    if dsn:
+        import psycopg2
+        with psycopg2.connect(dsn) as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT COUNT(DISTINCT p.id), COUNT(d.id)
+                FROM penjualan p
+                LEFT JOIN penjualan_detail d ON d.penjualan_id = p.id
+                WHERE p.client_tx_id = %s
+            """, (tx["client_tx_id"],))
+            n_header, n_detail = cur.fetchone()
+        conn.close()
+        if n_header != 1 or n_detail != len(ITEMS):
+            masalah.append(f"di DB: {n_header} header, {n_detail} detail "
+                           f"(harus 1 dan {len(ITEMS)})")
+    return tx["client_tx_id"], status, masalah
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--base-url", default="http://127.0.0.1:5000")
+    ap.add_argument("--toko-id", type=int, default=1)
+    ap.add_argument("--parallel", type=int, default=16, help="Kiriman ganda per ronde")
+    ap.add_argument("--rounds", type=int, default=20)
+    ap.add_argument("--dsn", default=os.getenv("BENCH_DSN"),
+                    help="Opsional: cek jumlah baris langsung di database")
+    args = ap.parse_args()
+    base_url = args.base_url.rstrip("/")
+
+    gagal = 0
+    for n in range(1, args.rounds + 1):
+        tx_id, status, masalah = one_round(base_url, args.toko_id, args.parallel, args.dsn)
+        gagal += bool(masalah)
+        ringkas = f"ok={status.count('ok')} duplicate={status.count('duplicate')}"
+        print(f"{'✅' if not masalah else '❌'} ronde {n} {tx_id[:8]}: {ringkas}"
+              + (f" — {'; '.join(masalah)}" if masalah else ""))
+
+    print(f"{args.rounds - gagal}/{args.rounds} ronde lolos")
+    sys.exit(1 if gagal else 0)
+
+
+if __name__ == "__main__":
+    main()
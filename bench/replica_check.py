@@ -0,0 +1,69 @@
+"""
+Cek routing baca ke read replica pada server yang sedang jalan (dev server /
+satu worker — counter /api/pool-stats per proses).
+
+Dua instance Postgres (primary + standby), atau satu instance dengan role
+read-only terpisah:
+
+    CREATE ROLE kelontong_reader LOGIN PASSWORD 'reader';
+    GRANT pg_read_all_data TO kelontong_reader;          -- PG14+
+
+    DB_REPLICA_USER=kelontong_reader DB_REPLICA_PASSWORD=reader python app.py
+    python bench/replica_check.py --base-url http://127.0.0.1:5000
+
+Setiap route baca dipanggil sekali untuk rentang lama dan sekali untuk hari
+ini, lalu counter routing sebelum/sesudah dibandingkan. Exit 1 kalau route
+laporan lama tidak ada yang sampai ke replica.
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+
+import requests
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--base-url", default="http://127.0.0.1:5000")
+    ap.add_argument("--username", default="bench1")
+    ap.add_argument("--password", default="bench")
+    args = ap.parse_args()
+    base = args.base_url.rstrip("/")
+
+    s = requests.Session()
+    r = s.post(f"{base}/login", allow_redirects=False,
+               data={"username": args.username, "password": args.password})
+    if r.status_code != 302 or "/login" in r.headers.get("Location", ""):
+        sys.exit(f"Login {args.username} gagal (HTTP {r.status_code})")
+
+    def routed():
+        st = s.get(f"{base}/api/pool-stats").json()
+        if "replica" not in st:
+            sys.exit("Replica tidak aktif di server (DB_REPLICA_HOST / DB_REPLICA_USER kosong)")
+        return st["replica"]
+
+    today = date.today()
+    lama = {"start": (today - timedelta(days=60)).isoformat(),
+            "end": (today - timedelta(days=31)).isoformat()}
+    hari_ini = {"start": today.isoformat(), "end": today.isoformat()}
+    paths = ("/penjualan", "/penjualan-hari-ini/print-transaksi",
+             "/penjualan-hari-ini/export-transaksi/csv", "/penjualan-hari-ini/export-detail/xlsx")
+
+    for label, params in (("rentang lama", lama), ("hari ini", hari_ini)):
+        sebelum = routed()["routed"]
+        for path in paths:
+            r = s.get(base + path, params=params)
+            r.content
+            if r.status_code >= 400:
+                sys.exit(f"{path} → HTTP {r.status_code}")
+        st = routed()
+        selisih = {k: v - sebelum.get(k, 0) for k, v in st["routed"].items()}
+        print(f"{label}: {selisih}  (lag {st['lag_seconds']}s, down={st['down']})")
+        if label == "rentang lama" and not selisih.get("replica"):
+            print("❌ tidak ada query laporan lama yang dibaca dari replica")
+            sys.exit(1)
+    print("✅ routing replica jalan")
+
+
+if __name__ == "__main__":
+    main()
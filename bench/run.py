@@ -0,0 +1,231 @@
+"""
+Benchmark endpoint panas POS terhadap server yang sedang jalan.
+
+    python bench/run.py --base-url http://127.0.0.1:5000 --concurrency 8 --requests 200
+    python bench/run.py --scenarios sync,penjualan --range-days 30 --out bench/results/baru.json
+    python bench/run.py compare bench/results/lama.json bench/results/baru.json
+
+Setiap skenario dijalankan bergantian dengan `--concurrency` thread, masing-masing
+punya sesi login sendiri (bench1 / bench dari bench/seed.py). Hasil: throughput,
+latensi p50/p95/p99/maks dan jumlah error per skenario, disimpan sebagai JSON.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Client:
+    """Sesi HTTP yang sudah login; satu per thread."""
+
+    _local = threading.local()
+
+    def __init__(self, base_url, username, password):
+        self.base_url = base_url.rstrip("/")
+        self.username = username
+        self.password = password
+
+    def session(self):
+        s = getattr(self._local, "session", None)
+        if s is None:
+            s = requests.Session()
+            r = s.post(f"{self.base_url}/login", allow_redirects=False,
+                       data={"username": self.username, "password": self.password})
+            if r.status_code != 302 or "/login" in r.headers.get("Location", ""):
+                raise SystemExit(f"Login {self.username} gagal (HTTP {r.status_code})")
+            self._local.session = s
+        return s
+
+    def get(self, path, **kw):
+        return self.session().get(self.base_url + path, **kw)
+
+    def post(self, path, **kw):
+        return self.session().post(self.base_url + path, **kw)
+
+
+def build_scenarios(client, args):
+    """{nama: fungsi() → Response} untuk endpoint yang diuji."""
+    today = date.today()
+    rentang = {"start": (today - timedelta(days=args.range_days - 1)).isoformat(),
+               "end": today.isoformat()}
+
+    # barang nyata untuk sync & detail-barang (diambil sekali)
+    barang = client.get("/api/all-barang", params={"since": ""}).json()["rows"]
+    if not barang:
+        raise SystemExit("Master barang kosong — jalankan bench/seed.py dulu")
+    laris = barang[: max(1, len(barang) // 10)]
+
+    def sync():
+        items = [{
+            "barcode": b["barcode"], "nama": b["nama"], "qty": random.randint(1, 3),
+            "harga_jual": b["harga_jual"], "harga_beli": b["harga_beli"], "potongan": 0,
+        } for b in random.sample(barang, k=min(len(barang), random.randint(1, 2 * args.items - 1)))]
+        total = sum(i["qty"] * i["harga_jual"] for i in items)
+        return client.post("/api/sync-transaksi", json={
+            "client_tx_id": str(uuid.uuid4()),
+            "tanggal_client": datetime.now().isoformat(timespec="seconds"),
+            "pembeli": None,
+            "metode_bayar": "tunai",
+            "bayar": total,
+            "kembalian": 0,
+            "toko_id": args.toko_id,
+            "items": items,
+        })
+
+    def detail_barang():
+        b = random.choice(laris)
+        harga = b["harga_jual"]
+        harga = int(harga) if float(harga).is_integer() else harga
+        return client.get(f"/api/detail-barang/{b['barcode']}/{harga}")
+
+    return {
+        "sync": sync,
+        "all_barang": lambda: client.get("/api/all-barang", headers={"Cache-Control": "no-cache"}),
+        "penjualan": lambda: client.get("/penjualan", params=rentang),
+        "export_transaksi_xlsx": lambda: client.get(
+            "/penjualan-hari-ini/export-transaksi/xlsx", params=rentang),
+        "export_detail_xlsx": lambda: client.get(
+            "/penjualan-hari-ini/export-detail/xlsx", params=rentang),
+        "detail_barang": detail_barang,
+    }
+
+
+def percentile(sorted_vals, p):
+    """Nearest-rank percentile dari list yang sudah urut."""
+    if not sorted_vals:
+        return None
+    k = max(0, min(len(sorted_vals) - 1, math.ceil(p / 100 * len(sorted_vals)) - 1))
+    return sorted_vals[k]
+
+
+def run_scenario(fn, n_requests, concurrency, warmup):
+    for _ in range(warmup):
+        fn()
+
+    latencies, errors, nbytes = [], 0, 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors, nbytes
+        t0 = time.perf_counter()
+        try:
+            r = fn()
+            body = r.content          # baca sampai habis (export streaming)
+            ok = r.status_code < 400
+        except requests.RequestException:
+            body, ok = b"", False
+        dt = time.perf_counter() - t0
+        with lock:
+            latencies.append(dt)
+            nbytes += len(body)
+            errors += not ok
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        list(ex.map(one, range(n_requests)))
+    wall = time.perf_counter() - t0
+
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 2) if v is not None else None
+    return {
+        "requests": n_requests,
+        "errors": errors,
+        "seconds": round(wall, 3),
+        "throughput_rps": round(n_requests / wall, 2) if wall else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+        "avg_bytes": int(nbytes / n_requests) if n_requests else 0,
+    }
+
+
+def git_rev():
+    try:
+        return subprocess.check_output(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"],
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(path_a, path_b):
+    """Bandingkan dua file hasil: perubahan throughput & p95 per skenario."""
+    with open(path_a) as f:
+        a = json.load(f)
+    with open(path_b) as f:
+        b = json.load(f)
+    print(f"{'skenario':24} {'rps A':>9} {'rps B':>9} {'Δ':>7}   {'p95 A':>9} {'p95 B':>9} {'Δ':>7}")
+    for nama, rb in b["results"].items():
+        ra = a["results"].get(nama)
+        if not ra:
+            continue
+        d_rps = (rb["throughput_rps"] / ra["throughput_rps"] - 1) * 100 if ra["throughput_rps"] else 0
+        d_p95 = (rb["p95_ms"] / ra["p95_ms"] - 1) * 100 if ra["p95_ms"] else 0
+        print(f"{nama:24} {ra['throughput_rps']:>9} {rb['throughput_rps']:>9} {d_rps:>+6.1f}%"
+              f"   {ra['p95_ms']:>9} {rb['p95_ms']:>9} {d_p95:>+6.1f}%")
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "compare":
+        compare(sys.argv[2], sys.argv[3])
+        return
+
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--base-url", default="http://127.0.0.1:5000")
+    ap.add_argument("--username", default="bench1")
+    ap.add_argument("--password", default="bench")
+    ap.add_argument("--toko-id", type=int, default=1, help="toko_id milik --username")
+    ap.add_argument("--scenarios", default="sync,all_barang,penjualan,detail_barang,"
+                                            "export_transaksi_xlsx,export_detail_xlsx")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--requests", type=int, default=200, help="Request per skenario")
+    ap.add_argument("--export-requests", type=int, default=20, help="Request per skenario export")
+    ap.add_argument("--warmup", type=int, default=3)
+    ap.add_argument("--range-days", type=int, default=30, help="Rentang tanggal /penjualan & export")
+    ap.add_argument("--items", type=int, default=5, help="Rata-rata item per transaksi sync")
+    ap.add_argument("--out", help="File JSON hasil (default bench/results/<waktu>-<rev>.json)")
+    args = ap.parse_args()
+
+    client = Client(args.base_url, args.username, args.password)
+    scenarios = build_scenarios(client, args)
+    dipilih = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    for nama in dipilih:
+        if nama not in scenarios:
+            raise SystemExit(f"Skenario tidak dikenal: {nama} (ada: {', '.join(scenarios)})")
+
+    results = {}
+    for nama in dipilih:
+        n = args.export_requests if nama.startswith("export") else args.requests
+        print(f"▶ {nama}: {n} request, concurrency {args.concurrency} ...", flush=True)
+        results[nama] = r = run_scenario(scenarios[nama], n, args.concurrency, args.warmup)
+        print(f"  {r['throughput_rps']} req/s  p50 {r['p50_ms']} ms  p95 {r['p95_ms']} ms  "
+              f"p99 {r['p99_ms']} ms  error {r['errors']}")
+
+    rev = git_rev()
+    out = args.out or os.path.join(
+        ROOT, "bench", "results", f"{datetime.now():%Y%m%d-%H%M%S}-{rev or 'norev'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({
+            "git_rev": rev,
+            "waktu": datetime.now().isoformat(timespec="seconds"),
+            "params": {k: v for k, v in vars(args).items() if k != "password"},
+            "results": results,
+        }, f, indent=2)
+    print(f"Hasil disimpan di {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+-- Skema dasar untuk database benchmark (BUKAN skema produksi).
+-- Direkonstruksi dari kolom yang dipakai app.py; tabel & view di bawah ini
+-- sudah ada di produksi sebelum migrations/ dibuat. Setelah file ini,
+-- bench/seed.py menjalankan migrations/*.sql seperti `flask migrate`.
+
+CREATE TABLE toko (
+    id      SERIAL PRIMARY KEY,
+    nama    TEXT NOT NULL,
+    kode    TEXT NOT NULL UNIQUE,
+    alamat  TEXT
+);
+
+CREATE TABLE users (
+    id             SERIAL PRIMARY KEY,
+    nama           TEXT NOT NULL,
+    username       TEXT NOT NULL UNIQUE,
+    password_hash  TEXT NOT NULL,
+    role           TEXT NOT NULL DEFAULT 'kasir',
+    toko_id        INT NOT NULL REFERENCES toko(id)
+);
+
+CREATE TABLE pembeli (
+    id      SERIAL PRIMARY KEY,
+    nama    TEXT NOT NULL,
+    no_hp   TEXT UNIQUE,
+    alamat  TEXT
+);
+
+CREATE TABLE penjualan (
+    id            SERIAL PRIMARY KEY,
+    client_tx_id  UUID NOT NULL,
+    tanggal       TIMESTAMPTZ NOT NULL DEFAULT now(),
+    pembeli_id    INT REFERENCES pembeli(id),
+    metode_bayar  TEXT,
+    bayar         NUMERIC(14,2),
+    kembalian     NUMERIC(14,2),
+    toko_id       INT NOT NULL REFERENCES toko(id)
+);
+
+CREATE TABLE penjualan_detail (
+    id            SERIAL PRIMARY KEY,
+    penjualan_id  INT NOT NULL REFERENCES penjualan(id) ON DELETE CASCADE,
+    barcode       TEXT NOT NULL,
+    nama          TEXT NOT NULL,
+    qty           INT NOT NULL,
+    harga_jual    NUMERIC(14,2) NOT NULL,
+    harga_beli    NUMERIC(14,2) NOT NULL,
+    potongan      NUMERIC(14,2) DEFAULT 0
+);
+
+-- Satu baris per transaksi (nama view historis; dipakai untuk rentang apa pun)
+CREATE VIEW v_penjualan_hari_ini AS
+SELECT p.id,
+       p.toko_id,
+       p.tanggal,
+       LEFT(p.client_tx_id::text, 8)                                     AS tx8,
+       pb.nama,
+       pb.no_hp,
+       p.metode_bayar,
+       COALESCE(SUM(d.qty * d.harga_jual - COALESCE(d.potongan, 0)), 0) AS total,
+       COALESCE(SUM(d.qty * (d.harga_jual - d.harga_beli)
+                    - COALESCE(d.potongan, 0)), 0)                       AS laba,
+       COALESCE(SUM(d.qty), 0)                                          AS jml_item
+FROM penjualan p
+LEFT JOIN pembeli pb ON pb.id = p.pembeli_id
+LEFT JOIN penjualan_detail d ON d.penjualan_id = p.id
+GROUP BY p.id, pb.nama, pb.no_hp;
+
+CREATE VIEW v_laporan_ringkasan AS
+SELECT p.toko_id,
+       DATE(p.tanggal)                                                   AS tgl,
+       COUNT(DISTINCT p.id)                                              AS jml_transaksi,
+       COALESCE(SUM(d.qty), 0)                                          AS jml_item,
+       COALESCE(SUM(d.qty * d.harga_jual - COALESCE(d.potongan, 0)), 0) AS total_omzet,
+       COALESCE(SUM(d.qty * (d.harga_jual - d.harga_beli)
+                    - COALESCE(d.potongan, 0)), 0)                       AS total_laba
+FROM penjualan p
+LEFT JOIN penjualan_detail d ON d.penjualan_id = p.id
+GROUP BY p.toko_id, DATE(p.tanggal);
+
+CREATE VIEW v_penjualan_rekap_barang_hari_ini AS
+SELECT p.toko_id,
+       DATE(p.tanggal)                                       AS tgl,
+       d.barcode,
+       d.nama                                                AS item_nama,
+       d.harga_beli,
+       d.harga_jual,
+       SUM(d.qty)                                            AS total_qty,
+       SUM(d.qty * d.harga_jual - COALESCE(d.potongan, 0))   AS total_penjualan,
+       SUM(d.qty * (d.harga_jual - d.harga_beli)
+           - COALESCE(d.potongan, 0))                        AS total_laba
+FROM penjualan p
+JOIN penjualan_detail d ON d.penjualan_id = p.id
+GROUP BY p.toko_id, DATE(p.tanggal), d.barcode, d.nama, d.harga_beli, d.harga_jual;
+
+-- Data barang terakhir per barcode (nama & harga dari transaksi terbaru)
+CREATE VIEW v_barang_terbeli AS
+SELECT DISTINCT ON (d.barcode)
+       d.barcode, d.nama, d.harga_beli, d.harga_jual, p.tanggal AS terakhir_dibeli
+FROM penjualan_detail d
+JOIN penjualan p ON p.id = d.penjualan_id
+ORDER BY d.barcode, p.tanggal DESC;
@@ -0,0 +1,182 @@
+"""
+Isi database Postgres lokal dengan data sintetis untuk benchmark.
+
+    createdb kelontong_bench
+    python bench/seed.py --dsn "dbname=kelontong_bench user=postgres" --reset \
+        --toko 3 --barang 2000 --pembeli 500 --days 90 --tx-per-day 300
+
+Urutan: skema dasar (bench/schema.sql) → toko, users, pembeli, penjualan &
+detail (COPY) → migrations/*.sql seperti `flask migrate` (rollup rekap_harian
+dan barang_katalog ikut ter-backfill, penjualan dipindah ke tabel berpartisi
+bulanan) → ANALYZE.
+
+Login hasil seed: bench1 / bench (toko 1), bench2 / bench (toko 2), ...
+--reset MENGHAPUS seluruh schema public di database tujuan.
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import psycopg2
+from werkzeug.security import generate_password_hash
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_SQL = os.path.join(ROOT, "bench", "schema.sql")
+MIGRATIONS_DIR = os.path.join(ROOT, "migrations")
+
+KATA = ("Gula", "Beras", "Minyak", "Kopi", "Teh", "Susu", "Mie", "Sabun", "Sampo",
+        "Garam", "Kecap", "Saus", "Roti", "Biskuit", "Air", "Telur", "Tepung", "Rokok")
+MEREK = ("Sari", "Jaya", "Makmur", "Indah", "Sehat", "Segar", "Prima", "Abadi")
+UKURAN = ("250g", "500g", "1kg", "1L", "600ml", "75g", "sachet", "pak")
+METODE = ("tunai", "tunai", "tunai", "qris", "transfer")
+
+
+def copy_rows(cur, table, columns, rows):
+    """COPY baris (tuple) ke tabel; None → NULL."""
+    buf = io.StringIO()
+    for r in rows:
+        buf.write("\t".join("\\N" if v is None else str(v) for v in r))
+        buf.write("\n")
+    buf.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buf)
+
+
+def run_sql_file(cur, path):
+    with open(path, encoding="utf-8") as f:
+        cur.execute(f.read())
+
+
+def apply_migrations(conn):
+    """Sama dengan `flask migrate`: jalankan yang belum tercatat di schema_migrations."""
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            nama TEXT PRIMARY KEY,
+            dijalankan TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+    cur.execute("SELECT nama FROM schema_migrations")
+    sudah = {r[0] for r in cur.fetchall()}
+    for nama in sorted(os.listdir(MIGRATIONS_DIR)):
+        if not nama.endswith(".sql") or nama in sudah:
+            continue
+        t0 = time.perf_counter()
+        run_sql_file(cur, os.path.join(MIGRATIONS_DIR, nama))
+        cur.execute("INSERT INTO schema_migrations (nama) VALUES (%s)", (nama,))
+        conn.commit()
+        print(f"  migrasi {nama} ({time.perf_counter() - t0:.1f}s)")
+    cur.close()
+
+
+def make_barang(n, rnd):
+    barang = []
+    for i in range(n):
+        beli = rnd.randint(10, 500) * 100
+        jual = int(beli * rnd.uniform(1.08, 1.30) / 500 + 1) * 500
+        nama = f"{rnd.choice(KATA)} {rnd.choice(MEREK)} {rnd.choice(UKURAN)} #{i + 1}"
+        barang.append((f"899{i + 1:010d}", nama, beli, jual))
+    return barang
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--dsn", default=os.getenv("BENCH_DSN"),
+                    help="DSN psycopg2 database benchmark (atau env BENCH_DSN)")
+    ap.add_argument("--reset", action="store_true", help="DROP SCHEMA public CASCADE dulu")
+    ap.add_argument("--toko", type=int, default=3)
+    ap.add_argument("--barang", type=int, default=2000)
+    ap.add_argument("--pembeli", type=int, default=500)
+    ap.add_argument("--days", type=int, default=90, help="Histori hari ke belakang (termasuk hari ini)")
+    ap.add_argument("--tx-per-day", type=int, default=300, help="Rata-rata transaksi per toko per hari")
+    ap.add_argument("--items", type=int, default=5, help="Rata-rata item per transaksi")
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+    if not args.dsn:
+        ap.error("--dsn atau env BENCH_DSN wajib diisi")
+
+    rnd = random.Random(args.seed)
+    conn = psycopg2.connect(args.dsn)
+    cur = conn.cursor()
+
+    cur.execute("SELECT to_regclass('public.penjualan')")
+    if cur.fetchone()[0] is not None and not args.reset:
+        sys.exit("Tabel penjualan sudah ada; pakai --reset untuk mengosongkan database ini.")
+    if args.reset:
+        cur.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public")
+    run_sql_file(cur, SCHEMA_SQL)
+    conn.commit()
+
+    t0 = time.perf_counter()
+    pw = generate_password_hash("bench")
+    copy_rows(cur, "toko", ("id", "nama", "kode", "alamat"),
+              [(t, f"Toko Bench {t}", f"bench{t}", f"Jl. Benchmark No. {t}")
+               for t in range(1, args.toko + 1)])
+    copy_rows(cur, "users", ("id", "nama", "username", "password_hash", "role", "toko_id"),
+              [(t, f"Kasir {t}", f"bench{t}", pw, "admin", t) for t in range(1, args.toko + 1)])
+    copy_rows(cur, "pembeli", ("id", "nama", "no_hp", "alamat"),
+              [(i, f"Pembeli {i}", f"628{i:010d}", None) for i in range(1, args.pembeli + 1)])
+
+    barang = make_barang(args.barang, rnd)
+    # popularitas ala Zipf: sedikit barang laris, banyak yang jarang terjual
+    bobot = [1 / (i + 1) for i in range(len(barang))]
+
+    now = datetime.now()
+    start_day = now.date() - timedelta(days=args.days - 1)
+    pid, did, n_tx, n_detail = 0, 0, 0, 0
+    for day in range(args.days):
+        tgl = start_day + timedelta(days=day)
+        buka = datetime.combine(tgl, datetime.min.time()) + timedelta(hours=7)
+        tutup = min(buka + timedelta(hours=14), now)
+        span = (tutup - buka).total_seconds()
+        if span <= 0:
+            continue
+
+        header, detail = [], []
+        for toko_id in range(1, args.toko + 1):
+            n = max(0, int(args.tx_per_day * rnd.uniform(0.7, 1.3) * span / (14 * 3600)))
+            for _ in range(n):
+                pid += 1
+                tanggal = buka + timedelta(seconds=rnd.uniform(0, span))
+                items = rnd.choices(barang, weights=bobot, k=rnd.randint(1, 2 * args.items - 1))
+                total = 0
+                for barcode, nama, beli, jual in items:
+                    did += 1
+                    qty = rnd.choice((1, 1, 1, 2, 2, 3, 5))
+                    total += qty * jual
+                    detail.append((did, pid, barcode, nama, qty, jual, beli, 0))
+                bayar = -(-total // 5000) * 5000
+                pembeli = rnd.randint(1, args.pembeli) if args.pembeli and rnd.random() < 0.3 else None
+                header.append((pid, uuid.UUID(int=rnd.getrandbits(128), version=4),
+                               tanggal.isoformat(sep=" "), pembeli, rnd.choice(METODE),
+                               bayar, bayar - total, toko_id))
+        copy_rows(cur, "penjualan", ("id", "client_tx_id", "tanggal", "pembeli_id",
+                                     "metode_bayar", "bayar", "kembalian", "toko_id"), header)
+        copy_rows(cur, "penjualan_detail", ("id", "penjualan_id", "barcode", "nama", "qty",
+                                            "harga_jual", "harga_beli", "potongan"), detail)
+        conn.commit()
+        n_tx += len(header)
+        n_detail += len(detail)
+        if (day + 1) % 10 == 0 or day + 1 == args.days:
+            print(f"  {tgl}: {n_tx} transaksi, {n_detail} detail")
+
+    for table in ("toko", "users", "pembeli", "penjualan", "penjualan_detail"):
+        cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {table}), false)")
+    conn.commit()
+    print(f"Data: {n_tx} transaksi, {n_detail} detail ({time.perf_counter() - t0:.1f}s)")
+
+    apply_migrations(conn)
+    conn.autocommit = True
+    cur.execute("VACUUM ANALYZE")
+    cur.close()
+    conn.close()
+    print(f"Selesai. Login: bench1..bench{args.toko} / bench")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Cek stream live /api/penjualan/stream pada server yang sedang jalan: buka
+stream sebagai user toko, sync beberapa transaksi baru, lalu ukur jeda dari
+request sync dikirim sampai event "penjualan" berisi id transaksi itu diterima.
+
+    python bench/stream_check.py --base-url http://127.0.0.1:5000 --count 10
+
+Exit 1 kalau ada transaksi yang tidak muncul di stream dalam --timeout detik.
+"""
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import requests
+
+
+def baca_stream(s, url, keluar, siap):
+    """Parse SSE sederhana: kirim (waktu_terima, data) setiap event "penjualan"."""
+    with s.get(url, stream=True, timeout=(5, 60)) as r:
+        if r.status_code != 200:
+            keluar.put(("error", f"HTTP {r.status_code}: {r.text[:200]}"))
+            return
+        event, data = None, []
+        for line in r.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                data.append(line[5:].strip())
+                siap.set()
+            elif line == "":
+                if event == "penjualan" and data:
+                    keluar.put((time.perf_counter(), json.loads("\n".join(data))))
+                event, data = None, []
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--base-url", default="http://127.0.0.1:5000")
+    ap.add_argument("--username", default="bench1")
+    ap.add_argument("--password", default="bench")
+    ap.add_argument("--toko-id", type=int, default=1)
+    ap.add_argument("--count", type=int, default=10, help="Jumlah transaksi yang di-sync")
+    ap.add_argument("--timeout", type=float, default=5.0)
+    args = ap.parse_args()
+    base = args.base_url.rstrip("/")
+
+    s = requests.Session()
+    r = s.post(f"{base}/login", allow_redirects=False,
+               data={"username": args.username, "password": args.password})
+    if r.status_code != 302 or "/login" in r.headers.get("Location", ""):
+        sys.exit(f"Login {args.username} gagal (HTTP {r.status_code})")
+
+    events, siap = queue.Queue(), threading.Event()
+    threading.Thread(target=baca_stream, daemon=True,
+                     args=(s, f"{base}/api/penjualan/stream", events, siap)).start()
+    if not siap.wait(10):
+        sys.exit("Stream tidak mengirim apa pun dalam 10 detik")
+
+    jeda, hilang = [], 0
+    for _ in range(args.count):
+        tx = {
+            "client_tx_id": str(uuid.uuid4()),
+            "tanggal_client": datetime.now().isoformat(timespec="seconds"),
+            "metode_bayar": "tunai", "bayar": 20000, "kembalian": 5000,
+            "pembeli": None, "toko_id": args.toko_id,
+            "items": [{"barcode": "8990000000001", "nama": "Gula Bench 1kg", "qty": 1,
+                       "harga_jual": 15000, "harga_beli": 12000, "potongan": 0}],
+        }
+        t0 = time.perf_counter()
+        js = requests.post(f"{base}/api/sync-transaksi", json=tx, timeout=30).json()
+        if js.get("status") != "ok":
+            sys.exit(f"Sync gagal: {js}")
+
+        batas = t0 + args.timeout
+        while True:
+            try:
+                item = events.get(timeout=max(0.0, batas - time.perf_counter()))
+            except queue.Empty:
+                hilang += 1
+                print(f"❌ id {js['id']} tidak muncul dalam {args.timeout:.0f} detik")
+                break
+            if item[0] == "error":
+                sys.exit(f"Stream ditolak: {item[1]}")
+            t_terima, data = item
+            if any(row["id"] == js["id"] for row in data.get("rows", [])):
+                jeda.append((t_terima - t0) * 1000)
+                print(f"✅ id {js['id']}: {jeda[-1]:.1f} ms, total transaksi {data['total']['transaksi']}")
+                break
+
+    if jeda:
+        jeda.sort()
+        print(f"jeda kirim sync → event: median {jeda[len(jeda) // 2]:.1f} ms, maks {jeda[-1]:.1f} ms")
+    sys.exit(1 if hilang else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# Konfigurasi gunicorn untuk produksi:
+#   gunicorn -c gunicorn.conf.py app:app
+# Semua nilai bisa diubah lewat environment (lihat docker-compose.yml).
+import multiprocessing
+import os
+
+bind = f"{os.getenv('FLASK_HOST', '0.0.0.0')}:{os.getenv('FLASK_PORT', '5000')}"
+
+# Proses × thread: export lambat di satu thread tidak memblokir kasir lain.
+# Tiap worker punya pool DB sendiri (DB_POOL_MAX), jadi total koneksi ke
+# Postgres ≈ workers × DB_POOL_MAX — sesuaikan dengan max_connections.
+workers = int(os.getenv("GUNICORN_WORKERS", min(4, multiprocessing.cpu_count() * 2)))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+# Stream live /api/penjualan/stream memakai satu thread selama terbuka;
+# PENJUALAN_STREAM_MAX (default 4) per worker harus di bawah `threads`.
+
+# Export XLSX rentang panjang bisa lama; worker idle diganti berkala
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = 200
+
+# Import app sekali di master (start cepat), lalu fork. `app` dibuat saat
+# import (modul tunggal, bukan factory): config dibaca dari environment saat
+# itu, tapi pool DB, thread feed penjualan dan WA worker dibuat malas per
+# proses (cek pid) — tidak ada koneksi/thread dari master yang ikut ter-fork.
+preload_app = True
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+
+
+def post_fork(server, worker):
+    """Buat pool DB milik worker ini (gagal cepat kalau DB tidak bisa dihubungi)."""
+    import app as kelontong
+
+    kelontong.get_pool()
+    if os.getenv("WA_WORKER_INPROCESS", "false").lower() in ("1", "true", "yes"):
+        # aman di banyak worker: klaim antrian pakai FOR UPDATE SKIP LOCKED
+        kelontong.start_wa_worker_thread()
+    server.log.info("worker %s: pool DB siap", worker.pid)
@@ -0,0 +1,5 @@
+-- Kunci idempotensi sync transaksi offline.
+-- /api/sync-transaksi/batch memakai INSERT ... ON CONFLICT (client_tx_id),
+-- jadi client_tx_id wajib punya unique index.
+CREATE UNIQUE INDEX IF NOT EXISTS penjualan_client_tx_id_key
+    ON penjualan (client_tx_id);
@@ -0,0 +1,19 @@
+-- Rollup laporan per toko per hari, diisi ulang per (toko, tanggal) setiap
+-- kali sync transaksi commit (lihat refresh_rekap() di app.py) atau lewat
+-- `flask rekap-refresh`. Kolom & isinya mengikuti view sumber apa adanya,
+-- jadi tabel dibuat langsung dari view (sekaligus backfill semua histori).
+
+CREATE TABLE IF NOT EXISTS rekap_harian AS
+SELECT toko_id, tgl, jml_transaksi, jml_item, total_omzet, total_laba
+FROM v_laporan_ringkasan;
+
+CREATE UNIQUE INDEX IF NOT EXISTS rekap_harian_toko_tgl_key
+    ON rekap_harian (toko_id, tgl);
+
+CREATE TABLE IF NOT EXISTS rekap_harian_barang AS
+SELECT toko_id, tgl, barcode, item_nama, harga_beli, harga_jual,
+       total_qty, total_penjualan, total_laba
+FROM v_penjualan_rekap_barang_hari_ini;
+
+CREATE INDEX IF NOT EXISTS rekap_harian_barang_toko_tgl_idx
+    ON rekap_harian_barang (toko_id, tgl);
@@ -0,0 +1,13 @@
+-- Index untuk filter tanggal setengah-terbuka (tanggal >= a AND tanggal < b)
+-- dan join/lookup detail. Cek pemakaiannya dengan `flask explain-check`.
+CREATE INDEX IF NOT EXISTS penjualan_toko_tanggal_idx
+    ON penjualan (toko_id, tanggal);
+
+CREATE INDEX IF NOT EXISTS penjualan_detail_penjualan_id_idx
+    ON penjualan_detail (penjualan_id);
+
+CREATE INDEX IF NOT EXISTS penjualan_detail_barcode_harga_idx
+    ON penjualan_detail (barcode, harga_jual);
+
+ANALYZE penjualan;
+ANALYZE penjualan_detail;
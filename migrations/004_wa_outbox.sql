@@ -0,0 +1,19 @@
+-- Outbox pesan WhatsApp: /api/send-wa hanya INSERT, pengiriman oleh WaWorker
+-- (`flask wa-worker` atau WA_WORKER_INPROCESS=1).
+CREATE TABLE IF NOT EXISTS wa_outbox (
+    id              BIGSERIAL PRIMARY KEY,
+    number          TEXT NOT NULL,
+    message         TEXT NOT NULL,
+    status          TEXT NOT NULL DEFAULT 'pending',   -- pending | sending | sent | failed
+    attempts        INT NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    last_error      TEXT,
+    response        TEXT,
+    created_at      TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at      TIMESTAMPTZ NOT NULL DEFAULT now(),
+    sent_at         TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS wa_outbox_antrian_idx
+    ON wa_outbox (next_attempt_at)
+    WHERE status IN ('pending', 'sending');
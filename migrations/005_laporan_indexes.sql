@@ -0,0 +1,12 @@
+-- Keyset pagination & pencarian untuk /api/laporan/per-barang.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- urutan barcode per toko: halaman pertama cukup baca awal index
+CREATE INDEX IF NOT EXISTS rekap_harian_barang_toko_barcode_idx
+    ON rekap_harian_barang (toko_id, barcode, tgl);
+
+-- q=... (ILIKE '%teks%') pada nama & barcode
+CREATE INDEX IF NOT EXISTS rekap_harian_barang_nama_trgm_idx
+    ON rekap_harian_barang USING gin (item_nama gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS rekap_harian_barang_barcode_trgm_idx
+    ON rekap_harian_barang USING gin (barcode gin_trgm_ops);
@@ -0,0 +1,28 @@
+-- Katalog barang ber-index untuk /api/barang/search (typeahead kasir).
+-- Diisi dari v_barang_terbeli, lalu dijaga oleh upsert_katalog() saat sync.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE TABLE IF NOT EXISTS barang_katalog (
+    barcode         TEXT PRIMARY KEY,     -- juga index untuk barcode persis
+    nama            TEXT NOT NULL,
+    harga_jual      NUMERIC,
+    harga_beli      NUMERIC,
+    terakhir_dibeli TIMESTAMPTZ
+);
+
+INSERT INTO barang_katalog (barcode, nama, harga_jual, harga_beli, terakhir_dibeli)
+SELECT barcode, nama, harga_jual, harga_beli, terakhir_dibeli
+FROM v_barang_terbeli
+ON CONFLICT (barcode) DO NOTHING;
+
+-- prefix: barcode LIKE 'q%' / lower(nama) LIKE 'q%'
+CREATE INDEX IF NOT EXISTS barang_katalog_barcode_prefix_idx
+    ON barang_katalog (barcode text_pattern_ops);
+CREATE INDEX IF NOT EXISTS barang_katalog_nama_prefix_idx
+    ON barang_katalog (lower(nama) text_pattern_ops);
+
+-- substring: lower(nama) LIKE '%q%'
+CREATE INDEX IF NOT EXISTS barang_katalog_nama_trgm_idx
+    ON barang_katalog USING gin (lower(nama) gin_trgm_ops);
+
+ANALYZE barang_katalog;
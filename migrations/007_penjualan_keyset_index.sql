@@ -0,0 +1,9 @@
+-- Keyset pagination daftar transaksi: ORDER BY tanggal DESC, id DESC per toko.
+-- Menggantikan penjualan_toko_tanggal_idx (prefix yang sama tetap melayani
+-- filter rentang tanggal).
+CREATE INDEX IF NOT EXISTS penjualan_toko_tanggal_id_idx
+    ON penjualan (toko_id, tanggal DESC, id DESC);
+
+DROP INDEX IF EXISTS penjualan_toko_tanggal_idx;
+
+ANALYZE penjualan;
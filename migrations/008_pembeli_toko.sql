@@ -0,0 +1,34 @@
+-- Pembeli per toko + delta sync (/api/pembeli?since=) + pencarian (/api/pembeli/search).
+-- toko_id NULL = pembeli bersama (terlihat di semua toko): data lama yang
+-- belum/pernah belanja di lebih dari satu toko, atau no_hp yang didaftarkan
+-- dari toko lain (no_hp tetap unik global).
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE pembeli ADD COLUMN IF NOT EXISTS toko_id INT REFERENCES toko(id);
+ALTER TABLE pembeli ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+-- pembeli yang semua transaksinya di satu toko → milik toko itu
+UPDATE pembeli pb
+SET toko_id = s.toko_id
+FROM (
+    SELECT pembeli_id, MIN(toko_id) AS toko_id
+    FROM penjualan
+    WHERE pembeli_id IS NOT NULL
+    GROUP BY pembeli_id
+    HAVING COUNT(DISTINCT toko_id) = 1
+) s
+WHERE pb.id = s.pembeli_id AND pb.toko_id IS NULL;
+
+-- delta: WHERE (toko_id = $1 OR toko_id IS NULL) AND updated_at > $2
+CREATE INDEX IF NOT EXISTS pembeli_toko_updated_idx
+    ON pembeli (toko_id, updated_at);
+
+-- cari: prefix no_hp / nama, dan nama mengandung teks
+CREATE INDEX IF NOT EXISTS pembeli_no_hp_prefix_idx
+    ON pembeli (no_hp text_pattern_ops);
+CREATE INDEX IF NOT EXISTS pembeli_nama_prefix_idx
+    ON pembeli (lower(nama) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS pembeli_nama_trgm_idx
+    ON pembeli USING gin (lower(nama) gin_trgm_ops);
+
+ANALYZE pembeli;
@@ -0,0 +1,255 @@
+-- Partisi bulanan (RANGE tanggal) untuk penjualan & penjualan_detail.
+--
+-- * penjualan_detail ikut punya kolom tanggal (= tanggal header) dan dipartisi
+--   dengan batas yang sama, jadi detail satu nota selalu satu bulan dengan
+--   headernya dan query rentang tanggal hanya membaca partisi bulan terkait.
+-- * PRIMARY KEY / UNIQUE di tabel partisi wajib memuat tanggal, jadi kunci
+--   idempotensi sync (client_tx_id, migrations/001) pindah ke tabel kecil
+--   penjualan_client_tx yang di-insert lebih dulu oleh /api/sync-transaksi.
+-- * Partisi bulan baru dibuat di muka oleh `flask partitions-maintain`
+--   (fungsi penjualan_buat_partisi di bawah); transaksi di luar partisi yang
+--   ada jatuh ke partisi *_default dan dipindah saat partisinya dibuat.
+-- * Bulan yang sudah tutup dibekukan (VACUUM FREEZE) sekali lewat
+--   `flask partitions-archive`, opsional dilepas ke schema arsip.
+--
+-- Data lama dipindah dalam transaksi migrasi ini (tabel dikunci selama
+-- proses). View yang bergantung pada kedua tabel dibuat ulang dari
+-- definisinya; GRANT khusus pada tabel/view perlu diberikan ulang.
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM penjualan WHERE tanggal IS NULL) THEN
+        RAISE EXCEPTION 'penjualan.tanggal masih ada yang NULL; isi dulu sebelum dipartisi';
+    END IF;
+END $$;
+
+LOCK TABLE penjualan, penjualan_detail IN ACCESS EXCLUSIVE MODE;
+
+CREATE SCHEMA IF NOT EXISTS arsip;
+
+-- 1. Simpan lalu drop view (dan view di atas view) yang memakai kedua tabel.
+CREATE TEMP TABLE _view_lama ON COMMIT DROP AS
+WITH RECURSIVE dep (oid, level) AS (
+    SELECT r.ev_class, 1
+    FROM pg_depend d
+    JOIN pg_rewrite r ON r.oid = d.objid
+    WHERE d.classid = 'pg_rewrite'::regclass
+      AND d.refobjid IN ('penjualan'::regclass, 'penjualan_detail'::regclass)
+      AND r.ev_class NOT IN ('penjualan'::regclass, 'penjualan_detail'::regclass)
+    UNION
+    SELECT r.ev_class, dep.level + 1
+    FROM dep
+    JOIN pg_depend d ON d.refobjid = dep.oid AND d.classid = 'pg_rewrite'::regclass
+    JOIN pg_rewrite r ON r.oid = d.objid
+    WHERE r.ev_class <> dep.oid
+)
+SELECT format('%I.%I', n.nspname, c.relname) AS nama,
+       c.relkind,
+       rtrim(pg_get_viewdef(c.oid), '; ') AS def,
+       MAX(dep.level) AS level
+FROM dep
+JOIN pg_class c ON c.oid = dep.oid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+GROUP BY n.nspname, c.relname, c.relkind, c.oid;
+
+CREATE TEMP TABLE _view_index_lama ON COMMIT DROP AS
+SELECT pg_get_indexdef(i.indexrelid) AS def
+FROM pg_index i
+JOIN _view_lama v ON i.indrelid = v.nama::regclass
+WHERE v.relkind = 'm';
+
+DO $$
+DECLARE
+    v record;
+BEGIN
+    FOR v IN SELECT * FROM _view_lama ORDER BY level DESC LOOP
+        EXECUTE format('DROP %s IF EXISTS %s',
+                       CASE v.relkind WHEN 'm' THEN 'MATERIALIZED VIEW' ELSE 'VIEW' END, v.nama);
+    END LOOP;
+END $$;
+
+-- 2. FK ke tabel lain (toko, pembeli, ...) dibuat ulang setelah tabel lama
+--    di-drop (nama tabel dicatat sebelum rename, jadi menunjuk tabel baru).
+CREATE TEMP TABLE _fk_lama ON COMMIT DROP AS
+SELECT conrelid::regclass::text AS tabel, conname, pg_get_constraintdef(oid) AS def
+FROM pg_constraint
+WHERE contype = 'f'
+  AND conrelid IN ('penjualan'::regclass, 'penjualan_detail'::regclass)
+  AND confrelid NOT IN ('penjualan'::regclass, 'penjualan_detail'::regclass);
+
+ALTER TABLE penjualan RENAME TO penjualan_lama;
+ALTER TABLE penjualan_detail RENAME TO penjualan_detail_lama;
+
+-- 3. Tabel induk berpartisi + partisi default + partisi per bulan.
+CREATE TABLE penjualan (
+    LIKE penjualan_lama INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE INCLUDING COMMENTS
+) PARTITION BY RANGE (tanggal);
+
+CREATE TABLE penjualan_detail (
+    LIKE penjualan_detail_lama INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE INCLUDING COMMENTS,
+    tanggal TIMESTAMPTZ NOT NULL
+) PARTITION BY RANGE (tanggal);
+
+CREATE TABLE penjualan_default PARTITION OF penjualan DEFAULT;
+CREATE TABLE penjualan_detail_default PARTITION OF penjualan_detail DEFAULT;
+
+-- Buat partisi penjualan_YYYYMM + penjualan_detail_YYYYMM untuk bulan `bulan`.
+-- Baris yang terlanjur masuk partisi default untuk bulan itu ikut dipindah
+-- (ATTACH gagal kalau default masih memuatnya). false = sudah ada.
+CREATE OR REPLACE FUNCTION penjualan_buat_partisi(bulan date) RETURNS boolean
+LANGUAGE plpgsql AS $$
+DECLARE
+    awal  date := date_trunc('month', bulan)::date;
+    akhir date := (date_trunc('month', bulan) + interval '1 month')::date;
+    h     text := 'penjualan_' || to_char(bulan, 'YYYYMM');
+    d     text := 'penjualan_detail_' || to_char(bulan, 'YYYYMM');
+BEGIN
+    IF to_regclass(h) IS NOT NULL THEN
+        RETURN false;
+    END IF;
+    EXECUTE format('CREATE TABLE %I (LIKE penjualan INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE)', h);
+    EXECUTE format('CREATE TABLE %I (LIKE penjualan_detail INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE)', d);
+    EXECUTE format('WITH m AS (DELETE FROM penjualan_detail_default WHERE tanggal >= %L AND tanggal < %L RETURNING *)
+                    INSERT INTO %I SELECT * FROM m', awal, akhir, d);
+    EXECUTE format('WITH m AS (DELETE FROM penjualan_default WHERE tanggal >= %L AND tanggal < %L RETURNING *)
+                    INSERT INTO %I SELECT * FROM m', awal, akhir, h);
+    EXECUTE format('ALTER TABLE penjualan ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', h, awal, akhir);
+    EXECUTE format('ALTER TABLE penjualan_detail ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', d, awal, akhir);
+    RETURN true;
+END $$;
+
+SELECT penjualan_buat_partisi(bulan::date)
+FROM generate_series(
+    date_trunc('month', COALESCE((SELECT MIN(tanggal) FROM penjualan_lama), now())),
+    GREATEST(date_trunc('month', now()) + interval '2 month',
+             date_trunc('month', COALESCE((SELECT MAX(tanggal) FROM penjualan_lama), now()))),
+    interval '1 month'
+) AS bulan;
+
+-- 4. Pindah data. Index dibuat sesudahnya (lebih cepat daripada per baris).
+INSERT INTO penjualan SELECT * FROM penjualan_lama;
+
+INSERT INTO penjualan_detail
+SELECT d.*, p.tanggal
+FROM penjualan_detail_lama d
+JOIN penjualan_lama p ON p.id = d.penjualan_id;
+
+-- Kunci idempotensi sync: satu baris per client_tx_id, tidak dipartisi.
+CREATE TABLE penjualan_client_tx (
+    client_tx_id  UUID PRIMARY KEY,
+    penjualan_id  BIGINT NOT NULL,
+    tanggal       TIMESTAMPTZ NOT NULL
+);
+
+INSERT INTO penjualan_client_tx (client_tx_id, penjualan_id, tanggal)
+SELECT client_tx_id, id, tanggal FROM penjualan_lama;
+
+-- Sequence id tetap yang lama (dipindah kepemilikannya supaya tidak ikut
+-- ter-drop); kolom identity dapat sequence baru mulai dari MAX(id).
+DO $$
+DECLARE
+    t   text;
+    seq text;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['penjualan', 'penjualan_detail'] LOOP
+        seq := pg_get_serial_sequence(t || '_lama', 'id');
+        IF seq IS NOT NULL AND NOT EXISTS (
+            SELECT 1 FROM pg_attribute
+            WHERE attrelid = (t || '_lama')::regclass AND attname = 'id' AND attidentity <> ''
+        ) THEN
+            EXECUTE format('ALTER SEQUENCE %s OWNED BY %I.id', seq, t);
+        ELSE
+            EXECUTE format('CREATE SEQUENCE %I OWNED BY %I.id', t || '_id_partisi_seq', t);
+            EXECUTE format('SELECT setval(%L, COALESCE((SELECT MAX(id) FROM %I), 0) + 1, false)',
+                           t || '_id_partisi_seq', t);
+            EXECUTE format('ALTER TABLE %I ALTER id SET DEFAULT nextval(%L)', t, t || '_id_partisi_seq');
+        END IF;
+    END LOOP;
+END $$;
+
+DROP TABLE penjualan_detail_lama;
+DROP TABLE penjualan_lama;
+
+-- 5. Constraint & index (nama sama dengan sebelumnya; index per partisi
+--    dibuat otomatis, termasuk untuk partisi yang dibuat kemudian).
+ALTER TABLE penjualan ADD CONSTRAINT penjualan_pkey PRIMARY KEY (id, tanggal);
+CREATE INDEX penjualan_toko_tanggal_id_idx ON penjualan (toko_id, tanggal DESC, id DESC);
+
+ALTER TABLE penjualan_detail ADD CONSTRAINT penjualan_detail_pkey PRIMARY KEY (id, tanggal);
+ALTER TABLE penjualan_detail ADD CONSTRAINT penjualan_detail_penjualan_fkey
+    FOREIGN KEY (penjualan_id, tanggal) REFERENCES penjualan (id, tanggal) ON DELETE CASCADE;
+CREATE INDEX penjualan_detail_penjualan_id_idx ON penjualan_detail (penjualan_id);
+CREATE INDEX penjualan_detail_barcode_harga_idx ON penjualan_detail (barcode, harga_jual);
+
+DO $$
+DECLARE
+    f record;
+BEGIN
+    FOR f IN SELECT * FROM _fk_lama LOOP
+        EXECUTE format('ALTER TABLE %s ADD CONSTRAINT %I %s', f.tabel, f.conname, f.def);
+    END LOOP;
+END $$;
+
+-- Status pembekuan/arsip per bulan (diisi `flask partitions-archive`).
+CREATE TABLE penjualan_partisi_arsip (
+    bulan      DATE PRIMARY KEY,
+    dibekukan  TIMESTAMPTZ,
+    dilepas    TIMESTAMPTZ
+);
+
+-- 6. View dibuat ulang, kini membaca tabel berpartisi. Join detail↔header
+--    (x.penjualan_id = y.id) ditambah x.tanggal = y.tanggal — selalu benar
+--    karena FK di atas — supaya partisi detail ikut terpangkas. Kalau hasil
+--    tulis ulang tidak valid (join lain bernama penjualan_id), definisi asli
+--    dipakai apa adanya.
+--    PK header kini (id, tanggal): `GROUP BY p.id` saja tidak lagi membuat
+--    kolom p.* lain bergantung fungsional (grouping_error), jadi tanggal
+--    alias header ikut ditambahkan ke GROUP BY di kedua versi definisi.
+--    Hasilnya sama karena id tetap unik.
+DO $$
+DECLARE
+    v      record;
+    jenis  text;
+    asli   text;
+    def    text;
+    a      text;
+BEGIN
+    FOR v IN SELECT * FROM _view_lama ORDER BY level LOOP
+        jenis := CASE v.relkind WHEN 'm' THEN 'MATERIALIZED VIEW' ELSE 'VIEW' END;
+        asli := v.def;
+        FOR a IN SELECT DISTINCT m[1] FROM regexp_matches(v.def, '\mpenjualan\s+(\w+)', 'g') AS m LOOP
+            -- Tanpa alias pg_get_viewdef menulis kolom sebagai penjualan.kolom.
+            IF a ~* '^(left|right|full|inner|cross|join|on|where|group|order|having|limit|union|window)$' THEN
+                a := 'penjualan';
+            END IF;
+            IF asli ~ ('GROUP BY [^\n]*\m' || a || '\.id\M')
+               AND asli !~ ('GROUP BY ([^\n]*, )?' || a || '\.tanggal(,|\n|$)') THEN
+                asli := regexp_replace(asli, '(GROUP BY [^\n]*\m' || a || '\.id\M)',
+                                       '\1, ' || a || '.tanggal', 'g');
+            END IF;
+        END LOOP;
+        def := regexp_replace(asli, '(\m\w+)\.penjualan_id = (\w+)\.id\M',
+                              '\1.penjualan_id = \2.id AND \1.tanggal = \2.tanggal', 'g');
+        def := regexp_replace(def, '(\m\w+)\.id = (\w+)\.penjualan_id\M',
+                              '\1.id = \2.penjualan_id AND \1.tanggal = \2.tanggal', 'g');
+        BEGIN
+            BEGIN
+                EXECUTE format('CREATE %s %s AS %s', jenis, v.nama, def);
+            EXCEPTION WHEN undefined_column THEN
+                EXECUTE format('CREATE %s %s AS %s', jenis, v.nama, asli);
+            END;
+        EXCEPTION WHEN grouping_error THEN
+            RAISE EXCEPTION 'view % tidak bisa dibuat ulang otomatis: %', v.nama, SQLERRM
+                USING HINT = 'Migrasi dibatalkan seluruhnya. Ubah GROUP BY view ini supaya memuat '
+                             'tanggal header (atau kolom yang di-SELECT), lalu jalankan ulang.',
+                      DETAIL = asli;
+        END;
+    END LOOP;
+    FOR v IN SELECT * FROM _view_index_lama LOOP
+        EXECUTE v.def;
+    END LOOP;
+END $$;
+
+ANALYZE penjualan;
+ANALYZE penjualan_detail;
+ANALYZE penjualan_client_tx;
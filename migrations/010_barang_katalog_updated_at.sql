@@ -0,0 +1,12 @@
+-- Versi delta /api/all-barang?since= dari waktu server saat baris katalog
+-- berubah (bukan tanggal transaksi dari kasir: sync offline yang terlambat
+-- membawa tanggal lama). Diisi upsert_katalog(); baris lama dapat now(),
+-- jadi klien yang sudah punya versi lama menerima semuanya sekali.
+ALTER TABLE barang_katalog
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+-- delta: WHERE updated_at > $1; versi: MAX(updated_at) (index scan mundur)
+CREATE INDEX IF NOT EXISTS barang_katalog_updated_at_idx
+    ON barang_katalog (updated_at);
+
+ANALYZE barang_katalog;
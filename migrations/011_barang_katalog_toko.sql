@@ -0,0 +1,18 @@
+-- Barang yang pernah dijual per toko, untuk membatasi /api/barang/search ke
+-- toko user yang login. barang_katalog sendiri tetap satu baris per barcode
+-- (nama/harga terakhir), tabel ini hanya keanggotaan (toko_id, barcode).
+-- Diisi upsert_katalog() saat sync; backfill dari histori penjualan.
+CREATE TABLE IF NOT EXISTS barang_katalog_toko (
+    toko_id  INT  NOT NULL REFERENCES toko(id),
+    barcode  TEXT NOT NULL REFERENCES barang_katalog (barcode) ON DELETE CASCADE,
+    PRIMARY KEY (toko_id, barcode)   -- juga index untuk EXISTS (toko_id, barcode) di pencarian
+);
+
+INSERT INTO barang_katalog_toko (toko_id, barcode)
+SELECT DISTINCT p.toko_id, d.barcode
+FROM penjualan_detail d
+JOIN penjualan p ON p.id = d.penjualan_id AND p.tanggal = d.tanggal
+JOIN barang_katalog k ON k.barcode = d.barcode
+ON CONFLICT DO NOTHING;
+
+ANALYZE barang_katalog_toko;
@@ -0,0 +1,60 @@
+"""
+Gateway WA tiruan untuk menguji WaWorker secara lokal.
+
+    python scripts/wa_stub_gateway.py --port 8089 --fail-rate 0.3 --delay 0.5
+    WA_GATEWAY_URL=http://127.0.0.1:8089/send-message flask --app app wa-worker
+
+Setiap POST /send-message dibalas {"status": "sent"} setelah `--delay` detik,
+atau HTTP 503 dengan peluang `--fail-rate` (untuk menguji retry/backoff).
+Pesan yang diterima dicetak ke stdout.
+"""
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(fail_rate, delay):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/send-message":
+                self.send_error(404)
+                return
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            time.sleep(delay)
+
+            if random.random() < fail_rate:
+                status, reply = 503, {"status": "error", "msg": "stub: gagal acak"}
+            else:
+                status, reply = 200, {"status": "sent"}
+            print(status, body.decode("utf-8", "replace")[:200], flush=True)
+
+            data = json.dumps(reply).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8089)
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    ap.add_argument("--delay", type=float, default=0.0)
+    args = ap.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.fail_rate, args.delay))
+    print(f"Stub WA gateway di http://{args.host}:{args.port}/send-message", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -48,9 +48,12 @@ document.addEventListener('fullscreenchange', () => {
     btnFs.title = document.fullscreenElement ? "Keluar Fullscreen" : "Masuk Fullscreen";
 });
  
-// Register service worker
+// Register service worker (scope "/"; versi lama di /static/ dilepas)
 if ("serviceWorker" in navigator) {
-  navigator.serviceWorker.register("/static/service-worker.js")
+  navigator.serviceWorker.getRegistrations().then((regs) =>
+    regs.filter((r) => r.scope.endsWith("/static/")).forEach((r) => r.unregister())
+  );
+  navigator.serviceWorker.register("/service-worker.js")
     .then(() => console.log("Service Worker registered"))
     .catch(err => console.log("SW failed:", err));
 }
@@ -0,0 +1,182 @@
+// KasirDB — penyimpanan offline kasir di IndexedDB, dipakai halaman kasir dan
+// service worker (importScripts). Setiap perubahan ditulis per record, jadi
+// antrian ribuan transaksi tidak diserialisasi ulang setiap kali ada yang
+// masuk atau terkirim.
+//
+// Store:
+//   transactions  antrian transaksi belum tersinkron (key client_tx_id)
+//   masterBarang  cache master barang (key barcode)
+//   pembeli       cache pembeli toko dari server (key id)
+//   customers     pembeli yang dibuat di perangkat ini (key temp_id)
+//   meta          versi/etag delta sync, penanda migrasi (key key)
+(function (global) {
+  const DB_NAME = "kasir";
+  const DB_VERSION = 1;
+  const FLUSH_BATCH_SIZE = 100;
+  const FLUSH_URL = "/api/sync-transaksi/batch";
+
+  let dbPromise = null;
+
+  function open() {
+    if (!dbPromise) {
+      dbPromise = new Promise((resolve, reject) => {
+        const req = indexedDB.open(DB_NAME, DB_VERSION);
+        req.onupgradeneeded = () => {
+          const db = req.result;
+          const tx = db.createObjectStore("transactions", { keyPath: "client_tx_id" });
+          tx.createIndex("antri", "antri");
+          db.createObjectStore("masterBarang", { keyPath: "barcode" });
+          db.createObjectStore("pembeli", { keyPath: "id" });
+          db.createObjectStore("customers", { keyPath: "temp_id" });
+          db.createObjectStore("meta", { keyPath: "key" });
+        };
+        req.onsuccess = () => resolve(req.result);
+        req.onerror = () => { dbPromise = null; reject(req.error); };
+      });
+    }
+    return dbPromise;
+  }
+
+  // Jalankan fn(store...) dalam satu transaksi; resolve setelah commit.
+  async function run(stores, mode, fn) {
+    const db = await open();
+    return new Promise((resolve, reject) => {
+      const tx = db.transaction(stores, mode);
+      let result;
+      tx.oncomplete = () => resolve(result);
+      tx.onerror = () => reject(tx.error);
+      tx.onabort = () => reject(tx.error);
+      const handles = [].concat(stores).map((s) => tx.objectStore(s));
+      const req = fn(...handles);
+      if (req) req.onsuccess = () => { result = req.result; };
+    });
+  }
+
+  const get = (store, key) => run(store, "readonly", (s) => s.get(key));
+  const getAll = (store) => run(store, "readonly", (s) => s.getAll());
+  const count = (store) => run(store, "readonly", (s) => s.count());
+  const put = (store, value) => run(store, "readwrite", (s) => { s.put(value); });
+  const putMany = (store, values) =>
+    run(store, "readwrite", (s) => { values.forEach((v) => s.put(v)); });
+  const deleteMany = (store, keys) =>
+    run(store, "readwrite", (s) => { keys.forEach((k) => s.delete(k)); });
+  // isi ulang seluruh store (snapshot penuh dari server)
+  const replaceAll = (store, values) =>
+    run(store, "readwrite", (s) => { s.clear(); values.forEach((v) => s.put(v)); });
+
+  async function getMeta(key, fallback = "") {
+    const row = await get("meta", key);
+    return row ? row.value : fallback;
+  }
+  const setMeta = (key, value) => put("meta", { key, value });
+
+  // ---- antrian transaksi ----
+
+  const enqueue = (tx) => put("transactions", { ...tx, antri: Date.now() });
+
+  // `limit` transaksi tertua (urut waktu masuk antrian)
+  async function oldest(limit) {
+    const db = await open();
+    return new Promise((resolve, reject) => {
+      const out = [];
+      const tx = db.transaction("transactions", "readonly");
+      const req = tx.objectStore("transactions").index("antri").openCursor();
+      req.onsuccess = () => {
+        const cur = req.result;
+        if (cur && out.length < limit) {
+          out.push(cur.value);
+          cur.continue();
+        }
+      };
+      tx.oncomplete = () => resolve(out);
+      tx.onerror = () => reject(tx.error);
+    });
+  }
+
+  async function flushOnce() {
+    let total = 0;
+    while (true) {
+      const batch = await oldest(FLUSH_BATCH_SIZE);
+      if (batch.length === 0) return total;
+
+      const res = await fetch(FLUSH_URL, {
+        method: "POST",
+        credentials: "same-origin",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ transaksi: batch.map(({ antri, ...tx }) => tx) }),
+      });
+      if (!res.ok) throw new Error("HTTP " + res.status);
+      const js = await res.json();
+
+      // hapus yang sudah tersimpan di server (ok / duplicate), per record
+      const done = new Set(
+        (js.results || [])
+          .filter((r) => r.status === "ok" || r.status === "duplicate")
+          .map((r) => r.client_tx_id)
+      );
+      const keys = batch
+        .map((t) => t.client_tx_id)
+        .filter((id) => done.has(String(id).toLowerCase()));
+      // yang ditolak server dipindah ke belakang antrian supaya tidak menahan
+      // transaksi lain; dicoba lagi di flush berikutnya
+      const now = Date.now();
+      const gagal = batch
+        .filter((t) => !done.has(String(t.client_tx_id).toLowerCase()))
+        .map((t, i) => ({ ...t, antri: now + i }));
+      await run("transactions", "readwrite", (s) => {
+        keys.forEach((k) => s.delete(k));
+        gagal.forEach((t) => s.put(t));
+      });
+      if (keys.length === 0) return total;   // sisanya error, coba lagi nanti
+      total += keys.length;
+    }
+  }
+
+  // Kirim antrian per batch. Halaman & service worker bisa memanggil bersamaan;
+  // Web Locks memastikan hanya satu yang jalan (kirim ganda tetap aman di server).
+  let flushing = null;
+  function flushQueue() {
+    if (global.navigator && navigator.locks) {
+      return navigator.locks.request("kasir-flush", { ifAvailable: true }, (lock) =>
+        lock ? flushOnce() : 0
+      );
+    }
+    if (!flushing) flushing = flushOnce().finally(() => { flushing = null; });
+    return flushing;
+  }
+
+  // ---- migrasi sekali dari localStorage (versi lama halaman kasir) ----
+
+  async function migrateFromLocalStorage() {
+    if (typeof localStorage === "undefined" || await getMeta("migrasiLocalStorage", false)) return;
+    const json = (k, d) => { try { return JSON.parse(localStorage.getItem(k)) ?? d; } catch (e) { return d; } };
+    const now = Date.now();
+
+    const txs = json("transactions", []).map((t, i) => ({ ...t, antri: now + i }));
+    const barang = Object.entries(json("masterBarang", {})).map(([barcode, b]) => ({ barcode, ...b }));
+    const pembeli = Object.entries(json("masterPembeli", {})).map(([id, p]) => ({ id: Number(id), ...p }));
+    const customers = json("localCustomers", []).filter((c) => c && c.temp_id);
+    const meta = ["masterBarangVersion", "masterBarangEtag", "masterPembeliVersion"]
+      .filter((k) => localStorage.getItem(k) !== null)
+      .map((k) => ({ key: k, value: localStorage.getItem(k) }));
+
+    await run(["transactions", "masterBarang", "pembeli", "customers", "meta"], "readwrite",
+      (sTx, sBarang, sPembeli, sCust, sMeta) => {
+        txs.forEach((v) => sTx.put(v));
+        barang.forEach((v) => sBarang.put(v));
+        pembeli.forEach((v) => sPembeli.put(v));
+        customers.forEach((v) => sCust.put(v));
+        meta.forEach((v) => sMeta.put(v));
+        sMeta.put({ key: "migrasiLocalStorage", value: true });
+      });
+    // baru dihapus setelah transaksi IndexedDB di atas commit
+    ["transactions", "masterBarang", "masterPembeli", "localCustomers", ...meta.map((m) => m.key)]
+      .forEach((k) => localStorage.removeItem(k));
+    if (txs.length) console.log(`📦 ${txs.length} transaksi offline dipindah ke IndexedDB`);
+  }
+
+  global.KasirDB = {
+    open, get, getAll, count, put, putMany, deleteMany, replaceAll,
+    getMeta, setMeta, enqueue, flushQueue, migrateFromLocalStorage,
+  };
+})(self);
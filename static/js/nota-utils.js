@@ -172,13 +172,52 @@
     }
 
     // ===== API Fetch =====
+    // Cache nota per id; diisi massal oleh prefetchDetails() supaya cetak ulang /
+    // kirim WA tidak perlu request per transaksi.
+    const notaCache = new Map();
+
     async function fetchDetail(id) {
+      if (notaCache.has(id)) return notaCache.get(id);
       const r = await fetch(`/api/penjualan/${id}`);
       if (!r.ok) {
         const js = await r.json().catch(() => ({}));
         throw new Error(js.msg || "Gagal ambil data penjualan");
       }
-      return await r.json(); // {header, items}
+      const data = await r.json(); // {header, items}
+      notaCache.set(id, data);
+      return data;
+    }
+
+    // Ambil banyak nota sekaligus: prefetchDetails([1,2,3]) atau
+    // prefetchDetails({start, end}). Return [{header, items}].
+    async function prefetchDetails(arg) {
+      const hasil = [];
+      if (Array.isArray(arg)) {
+        const ids = arg.filter(id => !notaCache.has(id));
+        for (let i = 0; i < ids.length; i += 500) {
+          const r = await fetch("/api/penjualan/nota", {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ ids: ids.slice(i, i + 500) })
+          });
+          if (!r.ok) throw new Error("Gagal ambil data penjualan");
+          (await r.json()).rows.forEach(n => notaCache.set(n.header.id, n));
+        }
+        arg.forEach(id => notaCache.has(id) && hasil.push(notaCache.get(id)));
+        return hasil;
+      }
+
+      let cursor = null;
+      do {
+        const qs = new URLSearchParams({ start: arg.start, end: arg.end });
+        if (cursor) qs.set("cursor", cursor);
+        const r = await fetch(`/api/penjualan/nota?${qs}`);
+        if (!r.ok) throw new Error("Gagal ambil data penjualan");
+        const js = await r.json();
+        js.rows.forEach(n => { notaCache.set(n.header.id, n); hasil.push(n); });
+        cursor = js.next_cursor;
+      } while (cursor);
+      return hasil;
     }
 
     // ===== Print Nota =====
@@ -0,0 +1,132 @@
+// Service worker kasir — dirender route /service-worker.js (app.py).
+// PRECACHE berisi URL aset ber-hash isi file (asset_url), VERSION berubah
+// setiap ada aset yang berubah.
+const VERSION = {{ version|tojson }};
+const PRECACHE = {{ precache|tojson }};
+
+// KasirDB: antrian transaksi offline (IndexedDB) yang sama dengan halaman kasir
+importScripts({{ kasir_db_url|tojson }});
+
+const STATIC_CACHE = "kasir-static";          // aset ber-hash: cache-first, tidak pernah basi
+const PAGE_CACHE = `kasir-page-${VERSION}`;   // app shell "/": stale-while-revalidate
+const DATA_CACHE = "kasir-data";              // API master: stale-while-revalidate
+const CACHES = [STATIC_CACHE, PAGE_CACHE, DATA_CACHE];
+
+// API master untuk kasir; hasil lama langsung dipakai, versi baru diambil di
+// belakang. Hanya snapshot penuh (tanpa ?since= / since kosong): delta selalu
+// beda URL dan sudah disimpan halaman kasir di IndexedDB → network-only.
+// Halaman laporan/print/export & API lain: network-only (tidak disentuh).
+const SWR_API = ["/api/all-barang", "/api/pembeli"];
+const isDelta = (url) => !!url.searchParams.get("since");
+
+// Install: precache aset app shell
+self.addEventListener("install", (event) => {
+  event.waitUntil(
+    caches.open(STATIC_CACHE)
+      .then((cache) => cache.addAll(PRECACHE))
+      .then(() => self.skipWaiting())
+  );
+});
+
+// Activate: hapus cache versi lama & aset ber-hash yang sudah tidak dipakai
+self.addEventListener("activate", (event) => {
+  event.waitUntil((async () => {
+    for (const name of await caches.keys()) {
+      if (!CACHES.includes(name)) {
+        console.log("🧹 Deleting old cache:", name);
+        await caches.delete(name);
+      }
+    }
+    // entry delta dari versi SW lama (satu per nilai since) tidak pernah dipakai lagi
+    const data = await caches.open(DATA_CACHE);
+    for (const req of await data.keys()) {
+      if (isDelta(new URL(req.url))) await data.delete(req);
+    }
+    const cache = await caches.open(STATIC_CACHE);
+    const aktif = new Set(PRECACHE.map((u) => new URL(u, location.origin).href));
+    const pathAktif = new Set(PRECACHE.map((u) => new URL(u, location.origin).pathname));
+    for (const req of await cache.keys()) {
+      const url = new URL(req.url);
+      if (pathAktif.has(url.pathname) && !aktif.has(url.href)) {
+        await cache.delete(req);
+      }
+    }
+    await self.clients.claim();
+  })());
+});
+
+// Data & halaman milik user yang login: dibuang saat login/logout supaya
+// kasir toko lain di perangkat yang sama tidak melihatnya.
+function clearUserCaches() {
+  return Promise.all([caches.delete(PAGE_CACHE), caches.delete(DATA_CACHE)]);
+}
+
+async function cacheFirst(request) {
+  const cache = await caches.open(STATIC_CACHE);
+  const cached = await cache.match(request);
+  if (cached) return cached;
+  const res = await fetch(request);
+  if (res.ok) await cache.put(request, res.clone());
+  return res;
+}
+
+// Satu entry per path (query ?since= berbeda-beda tidak menumpuk)
+async function deleteOtherVariants(cache, url) {
+  const path = new URL(url).pathname;
+  for (const req of await cache.keys()) {
+    if (new URL(req.url).pathname === path && req.url !== url) {
+      await cache.delete(req);
+    }
+  }
+}
+
+async function staleWhileRevalidate(event, cacheName, onePerPath) {
+  const request = event.request;
+  const cache = await caches.open(cacheName);
+  const cached = await cache.match(request);
+  const network = fetch(request).then(async (res) => {
+    // redirect (mis. ke /login) & error tidak disimpan
+    if (res.ok && res.type === "basic" && !res.redirected) {
+      if (onePerPath) await deleteOtherVariants(cache, request.url);
+      await cache.put(request, res.clone());
+    }
+    return res;
+  });
+  if (cached) {
+    event.waitUntil(network.catch(() => {}));
+    return cached;
+  }
+  return network;
+}
+
+self.addEventListener("fetch", (event) => {
+  const request = event.request;
+  const url = new URL(request.url);
+  if (url.origin !== location.origin) return;
+
+  if (url.pathname === "/logout" || (url.pathname === "/login" && request.method === "POST")) {
+    event.waitUntil(clearUserCaches());
+    return;
+  }
+  if (request.method !== "GET") return;
+
+  if (url.pathname.startsWith("/static/") && url.searchParams.has("v")) {
+    event.respondWith(cacheFirst(request));
+  } else if (SWR_API.includes(url.pathname) && !isDelta(url)) {
+    event.respondWith(staleWhileRevalidate(event, DATA_CACHE, true));
+  } else if (request.mode === "navigate" && url.pathname === "/") {
+    event.respondWith(staleWhileRevalidate(event, PAGE_CACHE, false));
+  }
+  // selain itu network-only: laporan, print, export, sync, API lain
+});
+
+// Kirim antrian transaksi offline: Background Sync (didaftarkan halaman kasir
+// setiap transaksi baru, dijalankan browser saat online) & periodic sync.
+// Jika gagal, browser mengulang sync sendiri; periodic sync menunggu giliran berikut.
+function flushEvent(event) {
+  if (event.tag === "kasir-flush") {
+    event.waitUntil(KasirDB.flushQueue());
+  }
+}
+self.addEventListener("sync", flushEvent);
+self.addEventListener("periodicsync", flushEvent);